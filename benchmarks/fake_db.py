@@ -0,0 +1,111 @@
+""" In-process stand-in for psycopg2's connect/cursor.
+
+Statements are not executed, only counted; an optional per-statement latency and per-byte cost emulate
+round trips and server side parsing, so the installer's own overhead can be measured without a database.
+"""
+from itertools import count
+from threading import Lock
+from time import sleep
+
+# psycopg2.extensions.TRANSACTION_STATUS_*, read by psycopg2.pool when a connection is returned
+TRANSACTION_STATUS_IDLE = 0
+TRANSACTION_STATUS_INTRANS = 2
+
+
+class FakeStats:
+    def __init__(self):
+        self.connections = 0
+        self.statements = 0
+        self.bytes_sent = 0
+        self._lock = Lock()
+
+    def record(self, size):
+        with self._lock:
+            self.statements += 1
+            self.bytes_sent += size
+
+    def as_dict(self):
+        return {'connections': self.connections, 'statements': self.statements, 'bytes_sent': self.bytes_sent}
+
+
+class FakeCursor:
+    def __init__(self, connection):
+        self.connection = connection
+        self.rowcount = -1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, query, args=None):
+        size = len(query) if isinstance(query, (str, bytes)) else 0
+        self.connection.stats.record(size)
+        delay = self.connection.latency + size * self.connection.per_byte
+        if delay:
+            sleep(delay)
+        if not self.connection.autocommit:
+            self.connection.info.transaction_status = TRANSACTION_STATUS_INTRANS
+        self.rowcount = 0
+
+    def fetchone(self):
+        return None
+
+    def fetchall(self):
+        return []
+
+    def close(self):
+        pass
+
+
+class FakeConnectionInfo:
+    def __init__(self):
+        self.transaction_status = TRANSACTION_STATUS_IDLE
+
+
+class FakeConnection:
+    _pids = count(10000)
+
+    def __init__(self, stats, latency, per_byte):
+        self.stats = stats
+        self.latency = latency
+        self.per_byte = per_byte
+        self.autocommit = False
+        self.closed = 0
+        self.info = FakeConnectionInfo()
+        self._pid = next(self._pids)
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def set_session(self, autocommit=None, **kwargs):
+        if autocommit is not None:
+            self.autocommit = autocommit
+
+    def set_client_encoding(self, encoding):
+        pass
+
+    def get_backend_pid(self):
+        return self._pid
+
+    def commit(self):
+        self.stats.record(0)
+        self.info.transaction_status = TRANSACTION_STATUS_IDLE
+
+    def rollback(self):
+        self.stats.record(0)
+        self.info.transaction_status = TRANSACTION_STATUS_IDLE
+
+    def close(self):
+        self.closed = 1
+
+
+def fake_connect(stats: FakeStats, latency=0.0, per_byte=0.0):
+    """ Build a connect() replacement sharing stats between all connections it opens """
+
+    def connect(*args, **kwargs):
+        stats.connections += 1
+        return FakeConnection(stats, latency, per_byte)
+
+    return connect
@@ -0,0 +1,215 @@
+""" Run the clone_repo -> handle_deploy_path -> deploy_objects pipeline against a synthetic repository and report
+wall time, peak Python memory and disk I/O of every stage, so installer versions can be compared.
+
+    python -m benchmarks.run_benchmarks --objects 3000 --commits 500 --output before.json
+    python -m benchmarks.run_benchmarks --dsn "host=localhost dbname=bench user=bench password=bench"
+
+Prompts are answered with their defaults. Without --dsn statements go to the in-process fake driver.
+"""
+import json
+import sys
+import tracemalloc
+from argparse import ArgumentParser
+from os import path
+from tempfile import mkdtemp
+from time import perf_counter
+from unittest import mock
+
+sys.path.insert(0, path.dirname(path.dirname(path.abspath(__file__))))
+
+import postgres_builder  # noqa: E402
+from benchmarks.fake_db import FakeStats, fake_connect  # noqa: E402
+from benchmarks.synthetic_repo import generate_repository  # noqa: E402
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+def _io_counters():
+    """ Bytes read and written by this process so far, None if the platform doesn't expose them """
+    if psutil is not None:
+        counters = psutil.Process().io_counters()
+        return counters.read_bytes, counters.write_bytes
+    if resource is not None:
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        return usage.ru_inblock * 512, usage.ru_oublock * 512
+    return None
+
+
+def _measure(name, step):
+    io_before = _io_counters()
+    tracemalloc.reset_peak()
+    started = perf_counter()
+    error = None
+    try:
+        step()
+    except SystemExit:
+        error = 'deploy stopped'
+    wall = perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    io_after = _io_counters()
+
+    result = {'phase': name, 'wall': wall, 'peak_memory': peak, 'error': error}
+    if io_before is not None:
+        result['read_bytes'] = io_after[0] - io_before[0]
+        result['written_bytes'] = io_after[1] - io_before[1]
+    return result
+
+
+def _option(value):
+    key, _, raw = value.partition('=')
+    try:
+        return key, json.loads(raw)
+    except json.JSONDecodeError:
+        return key, raw
+
+
+def bench_properties(args, remote_path, workdir):
+    if args.dsn:
+        from psycopg2.extensions import parse_dsn
+
+        connection = parse_dsn(args.dsn)
+        connection.pop('password', None)
+        connection['port'] = int(connection.get('port', 5432))
+    else:
+        connection = {'host': 'fake', 'port': 5432, 'dbname': 'bench', 'user': 'bench'}
+
+    properties = {
+        'repo': {
+            'remote_path': remote_path,
+            'local_path': {'env': None, 'path': path.join(workdir, 'clone')},
+            'dist_path': {'env': None, 'path': path.join(workdir, 'dist')},
+            'release_branch': 'master',
+            'folder': args.folder
+        },
+        'db': {
+            'connection': connection,
+            'log_table': args.log_table,
+            'ledger_table': args.ledger_table
+        },
+        'misc': {'deploy_mode': args.deploy_mode}
+    }
+    properties['repo'].update(args.repo_option)
+    properties['misc'].update(args.misc_option)
+    return properties
+
+
+def prepare_database(dsn, log_table):
+    """ Create the log table the installer writes to, in its own schema if missing, so a fresh database can be
+    benchmarked. The schemas of the objects are created by the synthetic repository itself """
+    import psycopg2
+    from psycopg2 import sql
+
+    schema, table = log_table.split('.')
+    connection = psycopg2.connect(dsn)
+    try:
+        with connection, connection.cursor() as cur:
+            cur.execute(sql.SQL('''CREATE SCHEMA IF NOT EXISTS {schema};
+                                   CREATE TABLE IF NOT EXISTS {schema}.{table}
+                                   (
+                                       id              bigserial PRIMARY KEY,
+                                       created         timestamp NOT NULL DEFAULT now(),
+                                       branch          text,
+                                       deploy_mode     text,
+                                       is_successful   boolean,
+                                       deploy_type     text,
+                                       requests_folder text
+                                   )''').format(schema=sql.Identifier(schema), table=sql.Identifier(table)))
+    finally:
+        connection.close()
+
+
+def run_once(args, properties):
+    installer = postgres_builder.PostgresObjInstaller(properties, force=True)
+    phases = [_measure('clone_repo', installer.clone_repo),
+              _measure('handle_deploy_path', installer.handle_deploy_path),
+              _measure('deploy_objects', installer.deploy_objects)]
+    return {'phases': phases, 'installer_timings': installer.timings.as_dict()}
+
+
+def main():
+    parser = ArgumentParser(description='Benchmark the installer pipeline on a synthetic repository')
+    parser.add_argument('--workdir', help='folder for the synthetic repo, clone and dist, temporary by default')
+    parser.add_argument('--objects', type=int, default=1000)
+    parser.add_argument('--commits', type=int, default=100)
+    parser.add_argument('--script-size', type=int, default=2048)
+    parser.add_argument('--large-scripts', type=int, default=0)
+    parser.add_argument('--large-script-size', type=int, default=10 * 1024 * 1024)
+    parser.add_argument('--folder', default='bench')
+    parser.add_argument('--deploy-mode', default='separate')
+    parser.add_argument('--runs', type=int, default=1, help='pipeline runs in the same workdir, e.g. to bench fetch sync')
+    parser.add_argument('--dsn', help='libpq connection string of a local Postgresql, the fake driver is used if omitted')
+    parser.add_argument('--log-table', default='public.poi_bench_log')
+    parser.add_argument('--ledger-table', default=None, help='ledger table, disabled by default')
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='fake driver latency per statement')
+    parser.add_argument('--repo-option', type=_option, action='append', default=[], metavar='KEY=VALUE',
+                        help='extra key of repo cfg section, e.g. sync=fetch or materialize=objects')
+    parser.add_argument('--misc-option', type=_option, action='append', default=[], metavar='KEY=VALUE',
+                        help='extra key of misc cfg section, e.g. parallel_workers=4')
+    parser.add_argument('--output', help='write results as json to this file')
+    args = parser.parse_args()
+    args.repo_option = dict(args.repo_option)
+    args.misc_option = dict(args.misc_option)
+
+    workdir = path.abspath(args.workdir or mkdtemp(prefix='poi_bench_'))
+    remote_path = path.join(workdir, 'remote')
+    if not path.exists(remote_path):
+        started = perf_counter()
+        generate_repository(remote_path, args.objects, args.commits, args.folder, script_size=args.script_size,
+                            large_scripts=args.large_scripts, large_script_size=args.large_script_size)
+        print(f'Synthetic repository generated in {perf_counter() - started:.2f}s: {remote_path}')
+
+    properties = bench_properties(args, remote_path, workdir)
+    password = ''
+    if args.dsn:
+        from psycopg2.extensions import parse_dsn
+
+        password = parse_dsn(args.dsn).get('password', '')
+        prepare_database(args.dsn, args.log_table)
+
+    stats = FakeStats()
+    patches = [mock.patch('builtins.input', return_value=''),
+               mock.patch('maskpass.askpass', return_value=password)]
+    if not args.dsn:
+        connect = fake_connect(stats, latency=args.latency_ms / 1000)
+        patches.append(mock.patch('psycopg2.connect', connect))
+
+    results = []
+    tracemalloc.start()
+    for patch in patches:
+        patch.start()
+    try:
+        for run in range(args.runs):
+            results.append(run_once(args, properties))
+    finally:
+        for patch in reversed(patches):
+            patch.stop()
+        tracemalloc.stop()
+
+    for run, result in enumerate(results, start=1):
+        print(f'Run {run}')
+        print(f'{"phase":<22}{"wall, s":>10}{"peak mem, MiB":>15}{"read, MiB":>12}{"written, MiB":>14}')
+        for phase in result['phases']:
+            read = phase.get('read_bytes')
+            written = phase.get('written_bytes')
+            print(f'{phase["phase"]:<22}{phase["wall"]:>10.3f}{phase["peak_memory"] / 2 ** 20:>15.1f}'
+                  f'{"n/a" if read is None else f"{read / 2 ** 20:.1f}":>12}'
+                  f'{"n/a" if written is None else f"{written / 2 ** 20:.1f}":>14}'
+                  f'{"  " + phase["error"] if phase["error"] else ""}')
+    if not args.dsn:
+        print(f'Fake driver: {stats.as_dict()}')
+
+    if args.output:
+        with open(args.output, mode='wt', encoding='UTF-8') as f:
+            json.dump({'args': vars(args), 'results': results, 'fake_driver': None if args.dsn else stats.as_dict()},
+                      f, indent=2, default=str)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+""" Measure the cold start of the app: wall time from process start to exit of a command that stops right after
+startup, for the source script or the frozen exe, plus the slowest imports of the source version.
+
+    python -m benchmarks.startup --runs 10
+    python -m benchmarks.startup --exe dist/postgres_builder/postgres_builder.exe --runs 10
+
+By default the command is --help, which stops after the module imports. --validate also runs the config validation
+in batch mode with --validate-only, so the app exits right after it without touching the repository or the database.
+"""
+import json
+import re
+import statistics
+import subprocess
+import sys
+from argparse import ArgumentParser
+from os import environ, path
+from time import perf_counter
+
+_root = path.dirname(path.dirname(path.abspath(__file__)))
+_import_time = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)')
+
+
+def _command(args):
+    base = [args.exe] if args.exe else [sys.executable, path.join(_root, 'postgres_builder.py')]
+    if args.validate:
+        return base + ['--batch', '--validate-only']
+    return base + ['--help']
+
+
+def measure(command, runs):
+    durations = []
+    for _ in range(runs):
+        started = perf_counter()
+        subprocess.run(command, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                       cwd=_root)
+        durations.append(perf_counter() - started)
+    return durations
+
+
+def slowest_imports(top):
+    """ Top-level imports of postgres_builder by cumulative time, from python -X importtime """
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import postgres_builder'],
+                            capture_output=True, text=True, cwd=_root, env={**environ, 'PYTHONDONTWRITEBYTECODE': '1'})
+    imports = []
+    # children are printed before their parent, one level deeper; only the direct imports are listed,
+    # their own imports are counted in the cumulative time
+    for line in result.stderr.splitlines():
+        match = _import_time.match(line)
+        if match is None:
+            continue
+        depth = (len(match.group(3)) - 1) // 2
+        if depth == 0:
+            if match.group(4) == 'postgres_builder':
+                break
+            imports = []
+        elif depth == 1:
+            imports.append((match.group(4), int(match.group(2)) / 10 ** 6))
+    return sorted(imports, key=lambda i: i[1], reverse=True)[:top]
+
+
+def main():
+    parser = ArgumentParser(description='Benchmark the start time of the installer')
+    parser.add_argument('--exe', help='frozen app to measure, the source script is run if omitted')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--validate', action='store_true', help='include the config validation')
+    parser.add_argument('--imports', type=int, default=10, help='number of slowest imports to show for the source')
+    parser.add_argument('--output', help='write results as json to this file')
+    args = parser.parse_args()
+
+    command = _command(args)
+    # the first run warms the OS file cache(and unpacks a onefile exe), it is reported separately
+    first, *durations = measure(command, args.runs + 1)
+    result = {'command': command, 'first_run': first, 'runs': durations,
+              'median': statistics.median(durations), 'min': min(durations)}
+    print(f'{" ".join(command)}')
+    print(f'first run {first:.3f}s, median {result["median"]:.3f}s, min {result["min"]:.3f}s of {args.runs} runs')
+
+    if not args.exe and args.imports:
+        result['imports'] = slowest_imports(args.imports)
+        print(f'{"import":<40}{"cumulative, s":>15}')
+        for name, seconds in result['imports']:
+            print(f'{name:<40}{seconds:>15.3f}')
+
+    if args.output:
+        with open(args.output, mode='wt', encoding='UTF-8') as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
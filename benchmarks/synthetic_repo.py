@@ -0,0 +1,129 @@
+""" Generator of synthetic Postgresql repositories in pg_dummydb layout: OBJ/Schemas/<schema>/<type>/<name>.sql objects
+and a Requests/<folder>/objects.inst listing them after a script creating their schemas, so the repository deploys
+to an empty database. History is written with git fast-import, so deep histories
+of thousands of commits take seconds.
+"""
+import random
+import subprocess
+from os import makedirs, path
+
+_object_types = ('Tables', 'Functions', 'Views')
+
+
+def _table(schema, name, rng):
+    columns = ',\n'.join(f'    col_{i} {rng.choice(("integer", "text", "numeric", "timestamp"))}' for i in range(8))
+    return f'CREATE TABLE IF NOT EXISTS {schema}.{name}\n(\n    id bigint PRIMARY KEY,\n{columns}\n);\n'
+
+
+def _function(schema, name, rng):
+    return (f'CREATE OR REPLACE FUNCTION {schema}.{name}(p_id bigint)\n'
+            f'    RETURNS bigint\n'
+            f'    LANGUAGE plpgsql\n'
+            f'AS\n$function$\nBEGIN\n    RETURN p_id * {rng.randint(1, 1000)};\nEND;\n$function$;\n')
+
+
+def _view(schema, name, rng):
+    return f'CREATE OR REPLACE VIEW {schema}.{name} AS\nSELECT {rng.randint(1, 1000)} AS id, now() AS created;\n'
+
+
+_generators = {'Tables': _table, 'Functions': _function, 'Views': _view}
+
+
+def _schemas(schemas):
+    return ''.join(f'CREATE SCHEMA IF NOT EXISTS bench_{i};\n' for i in range(schemas))
+
+
+def _padded(content, size, revision):
+    """ Pad a script with comment lines up to size bytes """
+    header = f'-- revision {revision}\n'
+    padding = max(size - len(content) - len(header), 0)
+    line = '-- ' + 'x' * 76 + '\n'
+    return header + line * (padding // len(line)) + content
+
+
+def _data_script(schema, size, rng):
+    lines = [f'CREATE TABLE IF NOT EXISTS {schema}.bench_data(id bigint, payload text);\n']
+    total = len(lines[0])
+    row = 0
+    while total < size:
+        values = ',\n'.join(f'({row + i}, \'{rng.getrandbits(128):032x}\')' for i in range(500))
+        statement = f'INSERT INTO {schema}.bench_data(id, payload) VALUES\n{values};\n'
+        lines.append(statement)
+        total += len(statement)
+        row += 500
+    return ''.join(lines)
+
+
+def generate_repository(repo_path, objects=1000, commits=100, folder='bench', schemas=4, script_size=2048,
+                        changes_per_commit=20, large_scripts=0, large_script_size=10 * 1024 * 1024, seed=0):
+    """ Create a git repository at repo_path and return the list of paths written to objects.inst """
+    rng = random.Random(seed)
+    makedirs(repo_path, exist_ok=True)
+    subprocess.run(['git', 'init', '-q', '-b', 'master', repo_path], check=True)
+
+    specs = []
+    for i in range(objects):
+        object_type = _object_types[i % len(_object_types)]
+        schema = f'bench_{i % schemas}'
+        name = f'obj_{i:06d}'
+        specs.append((f'OBJ/Schemas/{schema}/{object_type}/{name}.sql', object_type, schema, name))
+
+    inst = [f'Requests/{folder}/schemas.sql']
+    inst += [fpath for fpath, *_ in sorted(specs, key=lambda s: (_object_types.index(s[1]), s[0]))]
+    inst += [f'Requests/{folder}/data_{i:03d}.sql' for i in range(large_scripts)]
+
+    process = subprocess.Popen(['git', 'fast-import', '--quiet'], cwd=repo_path, stdin=subprocess.PIPE)
+
+    def data(payload: bytes):
+        process.stdin.write(b'data %d\n' % len(payload))
+        process.stdin.write(payload)
+        process.stdin.write(b'\n')
+
+    def modify(fpath, content: str):
+        process.stdin.write(f'M 100644 inline {fpath}\n'.encode())
+        data(content.encode('utf-8'))
+
+    for revision in range(commits):
+        process.stdin.write(b'commit refs/heads/master\n')
+        process.stdin.write(b'mark :%d\n' % (revision + 1))
+        process.stdin.write(b'committer Benchmark <benchmark@localhost> %d +0000\n' % (1_600_000_000 + revision * 60))
+        data(f'Synthetic revision {revision}'.encode())
+        if revision:
+            process.stdin.write(b'from :%d\n' % revision)
+            changed = rng.sample(specs, min(changes_per_commit, len(specs)))
+        else:
+            changed = specs
+        for fpath, object_type, schema, name in changed:
+            modify(fpath, _padded(_generators[object_type](schema, name, rng), script_size, revision))
+
+        if revision == 0:
+            modify(f'Requests/{folder}/schemas.sql', _schemas(schemas))
+            for i in range(large_scripts):
+                modify(f'Requests/{folder}/data_{i:03d}.sql', _data_script('bench_0', large_script_size, rng))
+        if revision == commits - 1:
+            modify(f'Requests/{folder}/objects.inst', '\n'.join(inst) + '\n')
+
+    process.stdin.close()
+    if process.wait():
+        raise RuntimeError(f'git fast-import failed with code {process.returncode}')
+    subprocess.run(['git', 'reset', '-q', '--hard'], cwd=repo_path, check=True)
+    return inst
+
+
+if __name__ == '__main__':
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser(description='Generate a synthetic repository in pg_dummydb layout')
+    parser.add_argument('repo_path')
+    parser.add_argument('--objects', type=int, default=1000)
+    parser.add_argument('--commits', type=int, default=100)
+    parser.add_argument('--folder', default='bench')
+    parser.add_argument('--script-size', type=int, default=2048)
+    parser.add_argument('--large-scripts', type=int, default=0)
+    parser.add_argument('--large-script-size', type=int, default=10 * 1024 * 1024)
+    args = parser.parse_args()
+
+    paths = generate_repository(path.abspath(args.repo_path), args.objects, args.commits, args.folder,
+                                script_size=args.script_size, large_scripts=args.large_scripts,
+                                large_script_size=args.large_script_size)
+    print(f'{len(paths)} scripts listed in Requests/{args.folder}/objects.inst')
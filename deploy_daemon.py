@@ -0,0 +1,226 @@
+""" Long-running deploy server.
+
+Keeps the repository clone and a connection pool per configured target warm and accepts deploy jobs over HTTP
+on a local address, so CI pipelines don't pay process start, config validation, cloning and connecting per deploy.
+Jobs touching the same database are serialized, progress is streamed back as plain text lines and the last line
+is a json with the job result.
+
+    POST /deploy  {"folder": "JIRA-101", "release_branch": "release/42", "deploy_type": "release",
+                   "deploy_mode": "separate", "revert_branch": null, "force": false, "resume": false}
+    GET  /health
+"""
+import json
+import sys
+from argparse import ArgumentParser
+from copy import deepcopy
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from multiprocessing import freeze_support
+from os import getenv
+from queue import Queue
+from threading import Lock, Thread
+
+from psycopg2.pool import ThreadedConnectionPool
+from termcolor import cprint
+
+from postgres_builder import PropertiesValidator, PostgresObjInstaller
+
+
+class DeployDaemon:
+    __encoding = r'UTF8'
+
+    def __init__(self, config: dict, max_connections: int = 4):
+        self.config = deepcopy(config)
+        self.config['repo']['sync'] = PostgresObjInstaller.SyncMode.FETCH.value
+        self.max_connections = max_connections
+        self._password = getenv('POI_DB_PASSWORD', getenv('PGPASSWORD', ''))
+        self._repo_lock = Lock()
+        self._locks_lock = Lock()
+        self._target_locks = {}
+        self._pools = {}
+        self._jobs_lock = Lock()
+        self.jobs = 0
+
+    def next_job(self):
+        """Count a new job, returns its number"""
+        with self._jobs_lock:
+            self.jobs += 1
+            return self.jobs
+
+    def installer(self, job: dict):
+        config = deepcopy(self.config)
+        for key in ('release_branch', 'revert_branch', 'folder'):
+            if job.get(key):
+                config['repo'][key] = job[key]
+        if job.get('deploy_mode'):
+            config['misc']['deploy_mode'] = job['deploy_mode']
+
+        installer = PostgresObjInstaller(config, force=job.get('force', False), resume=job.get('resume', False),
+                                         interactive=False)
+        if job.get('deploy_type'):
+            installer.deploy_type = job['deploy_type']
+        for target in installer.db_targets:
+            target.password = self._password
+        return installer
+
+    def warm_up(self):
+        """Clone or fetch the repository and open a connection to every configured target"""
+        installer = self.installer({})
+        with self._repo_lock:
+            installer.clone_repo()
+        for target in installer.db_targets:
+            self._pool(target)
+            cprint(f'Connection pool is ready: {target.label}', 'light_green')
+
+    def _pool(self, target):
+        with self._locks_lock:
+            if target.label not in self._pools:
+                self._pools[target.label] = ThreadedConnectionPool(1, self.max_connections, **target.as_dict())
+            return self._pools[target.label]
+
+    def _target_lock(self, label):
+        with self._locks_lock:
+            return self._target_locks.setdefault(label, Lock())
+
+    def run_job(self, job: dict, emit) -> bool:
+        """Prepare and deploy one job, emit receives progress lines; returns True if the deploy succeeded"""
+        installer = None
+        try:
+            # a bad job fails here, it is reported like any other failed deploy
+            installer = self.installer(job)
+            installer.listeners.append(lambda message, color: emit(str(message)))
+            labels = sorted({target.label for target in installer.db_targets})
+            locks = [self._target_lock(label) for label in labels]
+            emit(f'Waiting for databases: {", ".join(labels)}')
+            for lock in locks:
+                lock.acquire()
+            connections = {}
+            try:
+                # pooled connections are in place before the scripts are prepared, diff mode reads the last
+                # deployed commit through them instead of opening connections of its own
+                for target in installer.db_targets:
+                    connection = self._pool(target).getconn()
+                    connection.set_session(autocommit=True)
+                    connection.set_client_encoding(self.__encoding)
+                    connections[target.label] = connection
+                installer.use_connections(connections)
+
+                # the clone is shared, so syncing and materializing scripts are serialized between jobs
+                with self._repo_lock:
+                    installer.clone_repo()
+                    installer.handle_deploy_path()
+
+                installer.deploy_objects()
+                return True
+            finally:
+                for label, connection in connections.items():
+                    self._pools[label].putconn(connection, close=bool(connection.closed))
+                for lock in reversed(locks):
+                    lock.release()
+        except SystemExit as e:
+            return e.code in (None, 0)
+        except Exception as e:
+            emit(f'{type(e).__name__}: {e}')
+            return False
+        finally:
+            # every job has a log of its own, its file and flusher thread must not outlive the job
+            if installer is not None:
+                installer.close_log()
+
+    def close(self):
+        for pool in self._pools.values():
+            pool.closeall()
+
+
+class DeployRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def _send_json(self, status, body):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _write_chunk(self, text):
+        data = text.encode('utf-8')
+        self.wfile.write(b'%x\r\n%s\r\n' % (len(data), data))
+        self.wfile.flush()
+
+    def do_GET(self):
+        if self.path != '/health':
+            return self._send_json(404, {'error': 'not found'})
+        daemon = self.server.deploy_daemon
+        self._send_json(200, {'status': 'ok', 'jobs': daemon.jobs, 'targets': sorted(daemon._pools)})
+
+    def do_POST(self):
+        if self.path != '/deploy':
+            return self._send_json(404, {'error': 'not found'})
+        try:
+            job = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        except json.JSONDecodeError as e:
+            return self._send_json(400, {'error': f'invalid job: {e}'})
+        if not isinstance(job, dict):
+            return self._send_json(400, {'error': 'invalid job: a json object is expected'})
+
+        daemon = self.server.deploy_daemon
+        number = daemon.next_job()
+        progress = Queue()
+
+        def work():
+            # the handler waits for None, it is sent whatever happens to the job
+            try:
+                is_successful = daemon.run_job(job, progress.put)
+                progress.put(json.dumps({'status': 'success' if is_successful else 'failed', 'job': job}))
+            finally:
+                progress.put(None)
+
+        Thread(target=work, name=f'deploy job {number}', daemon=True).start()
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; charset=utf-8')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        connected = True
+        while (line := progress.get()) is not None:
+            if connected:
+                try:
+                    self._write_chunk(f'{line}\n')
+                except OSError:
+                    # the job keeps running when the client goes away
+                    connected = False
+        if connected:
+            self._write_chunk('')
+
+
+def serve(config: dict, host='127.0.0.1', port=8765, max_connections=4):
+    daemon = DeployDaemon(config, max_connections)
+    daemon.warm_up()
+    server = ThreadingHTTPServer((host, port), DeployRequestHandler)
+    server.deploy_daemon = daemon
+    cprint(f'Deploy daemon is listening on http://{host}:{port}', 'light_green', attrs=['bold'])
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        daemon.close()
+
+
+if __name__ == '__main__':
+    freeze_support()
+    parser = ArgumentParser(description='Deploy server keeping the clone and db connections warm between deploys. '
+                                        'The db password is read from POI_DB_PASSWORD or PGPASSWORD')
+    parser.add_argument('--config', help='config file name from configs folder, default is the first valid one')
+    parser.add_argument('--listen', default='127.0.0.1:8765', help='host:port to accept deploy jobs on')
+    parser.add_argument('--max-connections', type=int, default=4, help='connection pool size per target')
+    args = parser.parse_args()
+
+    listen_host, _, listen_port = args.listen.rpartition(':')
+    validator = PropertiesValidator(interactive=False, selected_config=args.config)
+    try:
+        serve(validator.validate_properties(), listen_host or '127.0.0.1', int(listen_port), args.max_connections)
+    except Exception as exc:
+        cprint(f'{type(exc).__name__}: {exc}', 'red')
+        sys.exit(1)
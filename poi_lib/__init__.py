@@ -1 +1,13 @@
 from .misc_funcs import resource_path
+from .dependency_graph import build_dependency_graph
+from .deploy_log import DeployLog
+from .timings import DeployTimings, timed
+from .lazy_module import LazyModule
+from .config_cache import ConfigValidationCache
+from .dist_store import DistStore
+from .lock_watch import BlockerWatch
+from .online_index import online_index_statements
+from .preflight import preflight, PreflightCache, parser_name as preflight_parser
+from .replaceable_objects import replaceable_object, temp_copy
+from .script_batches import is_batchable, batch_payload
+from .ddl_analysis import analyze_sql, is_blocking, regclass_text
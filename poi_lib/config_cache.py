@@ -0,0 +1,68 @@
+import json
+import sys
+from os import getenv, makedirs, path, replace, stat
+
+
+def user_cache_dir(app_name='pgObjectsInstaller'):
+    """ Per-user cache folder: %LOCALAPPDATA% on Windows, $XDG_CACHE_HOME or ~/.cache elsewhere """
+    if sys.platform == 'win32':
+        base = getenv('LOCALAPPDATA') or path.expanduser(r'~\AppData\Local')
+    else:
+        base = getenv('XDG_CACHE_HOME') or path.expanduser('~/.cache')
+    return path.join(base, app_name)
+
+
+class ConfigValidationCache:
+    """ Validation results of config files keyed by file mtime and size.
+
+    The results are dropped when the expected structure(its fingerprint) changes. A cache that can't be read
+    or written is ignored, the configs are validated as without it.
+    """
+
+    def __init__(self, fingerprint, fpath=None):
+        self.fpath = fpath or path.join(user_cache_dir(), 'config_validation.json')
+        self.fingerprint = fingerprint
+        self._entries = {}
+        self._is_changed = False
+        try:
+            with open(self.fpath, mode='rt', encoding='UTF-8') as f:
+                data = json.load(f)
+            if data.get('fingerprint') == fingerprint:
+                self._entries = data.get('entries', {})
+        except (OSError, ValueError, AttributeError):
+            pass
+
+    @staticmethod
+    def _key(file_path):
+        info = stat(file_path)
+        return [info.st_mtime_ns, info.st_size]
+
+    def get(self, file_path):
+        """ Cached result for the file, None if the file is unknown or was changed since """
+        entry = self._entries.get(path.abspath(file_path))
+        try:
+            if entry is not None and entry['key'] == self._key(file_path):
+                return entry['is_valid']
+        except OSError:
+            pass
+        return None
+
+    def set(self, file_path, is_valid):
+        try:
+            self._entries[path.abspath(file_path)] = {'key': self._key(file_path), 'is_valid': is_valid}
+            self._is_changed = True
+        except OSError:
+            pass
+
+    def save(self):
+        if not self._is_changed:
+            return
+        try:
+            makedirs(path.dirname(self.fpath), exist_ok=True)
+            tmp_path = f'{self.fpath}.tmp'
+            with open(tmp_path, mode='wt', encoding='UTF-8') as f:
+                json.dump({'fingerprint': self.fingerprint, 'entries': self._entries}, f)
+            replace(tmp_path, self.fpath)
+            self._is_changed = False
+        except OSError:
+            pass
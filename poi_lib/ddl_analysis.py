@@ -0,0 +1,132 @@
+import re
+from collections import namedtuple
+
+from .sql_text import identifier, split_statements, split_top_level
+
+_name = r'(?:"(?:[^"]|"")+"|[A-Za-z_][\w$]*)'
+_relation = rf'(?P<relation>{_name}(?:\s*\.\s*{_name})?)'
+_name_part = re.compile(_name)
+
+ACCESS_EXCLUSIVE = 'ACCESS EXCLUSIVE'
+EXCLUSIVE = 'EXCLUSIVE'
+SHARE_ROW_EXCLUSIVE = 'SHARE ROW EXCLUSIVE'
+SHARE = 'SHARE'
+SHARE_UPDATE_EXCLUSIVE = 'SHARE UPDATE EXCLUSIVE'
+
+# impact of an operation on a relation: the table is written anew or read through, the others only touch the catalog
+REWRITE = 'rewrite'
+SCAN = 'scan'
+
+DdlOperation = namedtuple('DdlOperation', ['relation', 'action', 'lock', 'impact'])
+
+_alter_table = re.compile(rf'^ALTER\s+TABLE\s+(?:IF\s+EXISTS\s+)?(?:ONLY\s+)?{_relation}\s*\*?\s+(?P<actions>.+)$',
+                          re.IGNORECASE | re.DOTALL)
+_create_index = re.compile(rf'^CREATE\s+(?:UNIQUE\s+)?INDEX\s+(?P<concurrently>CONCURRENTLY\s+)?'
+                           rf'(?:IF\s+NOT\s+EXISTS\s+)?(?:{_name}\s+)?ON\s+(?:ONLY\s+)?{_relation}',
+                           re.IGNORECASE)
+_reindex = re.compile(rf'^REINDEX\s+(?:\([^)]*\)\s*)?(?:TABLE|INDEX)\s+(?P<concurrently>CONCURRENTLY\s+)?{_relation}',
+                      re.IGNORECASE)
+_cluster = re.compile(rf'^CLUSTER\s+(?:\([^)]*\)\s*)?(?:VERBOSE\s+)?{_relation}', re.IGNORECASE)
+_vacuum_full = re.compile(rf'^VACUUM\s+(?:\([^)]*\bFULL\b[^)]*\)|FULL)\s*(?:FREEZE\s+)?(?:VERBOSE\s+)?'
+                          rf'(?:ANALYZE\s+)?{_relation}', re.IGNORECASE)
+_refresh = re.compile(rf'^REFRESH\s+MATERIALIZED\s+VIEW\s+(?P<concurrently>CONCURRENTLY\s+)?{_relation}',
+                      re.IGNORECASE)
+
+# functions whose value differs row by row, a column added with such a default is filled in by a rewrite
+_volatile_default = re.compile(r'\bDEFAULT\b.*\b(?:RANDOM|CLOCK_TIMESTAMP|TIMEOFDAY|GEN_RANDOM_UUID|UUID_GENERATE_\w+'
+                               r'|NEXTVAL|TXID_CURRENT|STATEMENT_TIMESTAMP)\s*\(', re.IGNORECASE | re.DOTALL)
+_serial = re.compile(r'\b(?:SMALLSERIAL|SERIAL|BIGSERIAL|SERIAL2|SERIAL4|SERIAL8)\b', re.IGNORECASE)
+
+_actions = [
+    (re.compile(r'^ALTER\s+(?:COLUMN\s+)?\S+\s+(?:SET\s+DATA\s+)?TYPE\b', re.IGNORECASE | re.DOTALL),
+     'type change', ACCESS_EXCLUSIVE, REWRITE),
+    (re.compile(r'^ALTER\s+(?:COLUMN\s+)?\S+\s+SET\s+NOT\s+NULL\b', re.IGNORECASE),
+     'SET NOT NULL', ACCESS_EXCLUSIVE, SCAN),
+    (re.compile(r'^ALTER\s+(?:COLUMN\s+)?\S+\s+(?:SET\s+STATISTICS|SET\s*\(|RESET\s*\()', re.IGNORECASE),
+     'column options', SHARE_UPDATE_EXCLUSIVE, None),
+    (re.compile(r'^ALTER\s+(?:COLUMN\s+)?\S+\s+ADD\s+GENERATED\b', re.IGNORECASE),
+     'identity', ACCESS_EXCLUSIVE, None),
+    (re.compile(r'^SET\s+(?:TABLESPACE|LOGGED|UNLOGGED|ACCESS\s+METHOD|WITHOUT\s+OIDS)\b', re.IGNORECASE),
+     'storage change', ACCESS_EXCLUSIVE, REWRITE),
+    (re.compile(r'^(?:SET|RESET)\s*\(', re.IGNORECASE),
+     'storage parameters', SHARE_UPDATE_EXCLUSIVE, None),
+    (re.compile(r'^VALIDATE\s+CONSTRAINT\b', re.IGNORECASE),
+     'constraint validation', SHARE_UPDATE_EXCLUSIVE, SCAN),
+    (re.compile(r'^ADD\s+(?:CONSTRAINT\s+\S+\s+)?FOREIGN\s+KEY\b(?!.*\bNOT\s+VALID\b)', re.IGNORECASE | re.DOTALL),
+     'foreign key', SHARE_ROW_EXCLUSIVE, SCAN),
+    (re.compile(r'^ADD\s+(?:CONSTRAINT\s+\S+\s+)?CHECK\b(?!.*\bNOT\s+VALID\b)', re.IGNORECASE | re.DOTALL),
+     'check constraint', ACCESS_EXCLUSIVE, SCAN),
+    (re.compile(r'^ADD\s+(?:CONSTRAINT\s+\S+\s+)?(?:PRIMARY\s+KEY|UNIQUE|EXCLUDE)\b'
+                r'(?!.*\bUSING\s+INDEX\s+(?!TABLESPACE))', re.IGNORECASE | re.DOTALL),
+     'index build', ACCESS_EXCLUSIVE, SCAN),
+    (re.compile(r'^ADD\s+(?:CONSTRAINT\s+\S+\s+)?(?:FOREIGN\s+KEY|CHECK)\b', re.IGNORECASE),
+     'constraint not validated', SHARE_ROW_EXCLUSIVE, None),
+    (re.compile(r'^(?:ATTACH\s+PARTITION|DETACH\s+PARTITION\s+\S+\s+CONCURRENTLY|CLUSTER\s+ON)\b', re.IGNORECASE),
+     'partitioning', SHARE_UPDATE_EXCLUSIVE, None),
+]
+_add_column = re.compile(r'^ADD\s+(?!CONSTRAINT\b|FOREIGN\b|CHECK\b|PRIMARY\b|UNIQUE\b|EXCLUDE\b)', re.IGNORECASE)
+
+
+def _add_column_operation(relation, action):
+    if _serial.search(action):
+        return DdlOperation(relation, 'serial column', ACCESS_EXCLUSIVE, REWRITE)
+    if re.search(r'\bGENERATED\b.*\bSTORED\b', action, re.IGNORECASE | re.DOTALL):
+        return DdlOperation(relation, 'generated column', ACCESS_EXCLUSIVE, REWRITE)
+    if _volatile_default.search(action):
+        return DdlOperation(relation, 'volatile default', ACCESS_EXCLUSIVE, REWRITE)
+    if re.search(r'\b(?:PRIMARY\s+KEY|UNIQUE)\b', action, re.IGNORECASE):
+        return DdlOperation(relation, 'index build', ACCESS_EXCLUSIVE, SCAN)
+    return DdlOperation(relation, 'add column', ACCESS_EXCLUSIVE, None)
+
+
+def relation_name(name):
+    """ (schema, name) of a possibly qualified relation name, schema is None if it isn't qualified """
+    parts = [identifier(part) for part in _name_part.findall(name)]
+    return (None, parts[0]) if len(parts) == 1 else (parts[0], parts[1])
+
+
+def regclass_text(relation):
+    """ Quoted relation name for to_regclass(), unqualified names are resolved by search_path """
+    return '.'.join('"' + part.replace('"', '""') + '"' for part in relation if part is not None)
+
+
+def analyze_statement(statement):
+    """ Operations of one statement on existing relations, empty for statements which don't lock tables """
+    match = _alter_table.match(statement)
+    if match is not None:
+        relation = relation_name(match.group('relation'))
+        operations = []
+        for action in split_top_level(match.group('actions')):
+            if _add_column.match(action):
+                operations.append(_add_column_operation(relation, action))
+                continue
+            for pattern, name, lock, impact in _actions:
+                if pattern.match(action):
+                    operations.append(DdlOperation(relation, name, lock, impact))
+                    break
+            else:
+                operations.append(DdlOperation(relation, 'alter table', ACCESS_EXCLUSIVE, None))
+        return operations
+
+    for pattern, name, lock, concurrent_lock, impact in (
+            (_create_index, 'index build', SHARE, SHARE_UPDATE_EXCLUSIVE, SCAN),
+            (_reindex, 'reindex', SHARE, SHARE_UPDATE_EXCLUSIVE, SCAN),
+            (_refresh, 'materialized view refresh', ACCESS_EXCLUSIVE, EXCLUSIVE, REWRITE),
+            (_cluster, 'cluster', ACCESS_EXCLUSIVE, None, REWRITE),
+            (_vacuum_full, 'vacuum full', ACCESS_EXCLUSIVE, None, REWRITE)):
+        match = pattern.match(statement)
+        if match is not None:
+            concurrently = concurrent_lock is not None and match.group('concurrently')
+            return [DdlOperation(relation_name(match.group('relation')), name,
+                                 concurrent_lock if concurrently else lock, impact)]
+    return []
+
+
+def analyze_sql(sql_text):
+    """ Operations of all statements of a script in their order """
+    return [operation for statement in split_statements(sql_text) for operation in analyze_statement(statement)]
+
+
+def is_blocking(operation):
+    """ True if the operation's lock blocks writes to the relation """
+    return operation.lock != SHARE_UPDATE_EXCLUSIVE
@@ -0,0 +1,70 @@
+import re
+from os import path
+
+_annotation = re.compile(r'^\s*--\s*depends\s*:\s*(.+)$', re.IGNORECASE | re.MULTILINE)
+_identifier = re.compile(r'"?([A-Za-z_][\w$]*)"?(?:\s*\.\s*"?([A-Za-z_][\w$]*)"?)?')
+
+
+def _normalize(fpath):
+    return fpath.replace('\\', '/').strip().strip('/')
+
+
+def defined_names(content_fpath):
+    """ Names an OBJ script defines, derived from its path: OBJ/Schemas/<schema>/<Type>/<name>.sql """
+    parts = _normalize(content_fpath).split('/')
+    name = path.splitext(parts[-1])[0].lower()
+    lowered = [p.lower() for p in parts]
+    if 'schemas' in lowered and lowered.index('schemas') + 1 < len(parts) - 1:
+        schema = lowered[lowered.index('schemas') + 1]
+        return {name, f'{schema}.{name}'}
+    return {name}
+
+
+def explicit_dependencies(sql_text):
+    """ Script paths listed in '-- depends: path[, path...]' annotations """
+    return {_normalize(dep) for line in _annotation.findall(sql_text) for dep in line.split(',') if dep.strip()}
+
+
+def referenced_names(sql_text):
+    names = set()
+    for first, second in _identifier.findall(sql_text):
+        first = first.lower()
+        names.add(first)
+        if second:
+            second = second.lower()
+            names.update((second, f'{first}.{second}'))
+    return names
+
+
+def build_dependency_graph(scripts, barriers=()):
+    """ Map index of each (content_fpath, sql_text) pair to indices of the earlier scripts it must wait for.
+
+    objects.inst order is the only allowed direction: a script may depend on scripts listed before it,
+    either through an explicit annotation or by referencing an object another OBJ script defines.
+    Scripts outside of OBJ catalog(Requests DML etc.) and the scripts of barriers indices(e.g. data files,
+    whose target table isn't known from the text) wait for everything before them and are waited for
+    by everything after them.
+    """
+    graph = {}
+    definers = {}
+    paths = {}
+    barrier = None
+
+    for i, (content_fpath, sql_text) in enumerate(scripts):
+        fpath = _normalize(content_fpath)
+        if not fpath.startswith('OBJ/') or i in barriers:
+            graph[i] = set(range(i))
+            barrier = i
+            continue
+
+        deps = {paths[dep] for dep in explicit_dependencies(sql_text) if dep in paths}
+        deps.update(j for name in referenced_names(sql_text) for j in definers.get(name, ()))
+        if barrier is not None:
+            deps.add(barrier)
+        graph[i] = deps
+
+        paths[fpath] = i
+        for name in defined_names(fpath):
+            definers.setdefault(name, []).append(i)
+
+    return graph
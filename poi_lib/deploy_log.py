@@ -0,0 +1,76 @@
+import atexit
+import json
+from datetime import datetime
+from threading import Lock, Event, Thread
+from time import monotonic
+
+
+class DeployLog:
+    """ Append-only log of a dist folder.
+
+    Keeps one file handle open, buffers lines and writes them out when the buffer grows over flush_size
+    or every flush_interval seconds, immediately for errors and at interpreter exit.
+    Safe to call from several threads.
+    """
+
+    def __init__(self, fpath, encoding='UTF-8', json_lines=False, flush_interval=1.0, flush_size=64 * 1024):
+        self.fpath = fpath
+        self._json_lines = json_lines
+        self._flush_interval = flush_interval
+        self._flush_size = flush_size
+        self._file = open(fpath, mode='a', encoding=encoding)
+        self._buffer = []
+        self._buffer_size = 0
+        self._last_flush = monotonic()
+        self._lock = Lock()
+        self._closed = Event()
+        self._flusher = Thread(target=self._flush_periodically, name=f'{self.__class__.__name__} flusher', daemon=True)
+        self._flusher.start()
+        atexit.register(self.close)
+
+    def write(self, message, level='info', target=None, **fields):
+        now = datetime.now()
+        if self._json_lines:
+            record = {'time': now.isoformat(), 'level': level, 'message': str(message)}
+            if target is not None:
+                record['target'] = target
+            record.update(fields)
+            line = json.dumps(record, ensure_ascii=False, default=str)
+        else:
+            line = f'{now}: {message}' if target is None else f'{now}: [{target}] {message}'
+
+        with self._lock:
+            if self._file is None:
+                return
+            self._buffer.append(f'{line}\n')
+            self._buffer_size += len(line) + 1
+            if level == 'error' or self._buffer_size >= self._flush_size \
+                    or monotonic() - self._last_flush >= self._flush_interval:
+                self._flush()
+
+    def flush(self):
+        with self._lock:
+            if self._file is not None:
+                self._flush()
+
+    def close(self):
+        with self._lock:
+            if self._file is None:
+                return
+            self._flush()
+            self._file.close()
+            self._file = None
+        self._closed.set()
+        atexit.unregister(self.close)
+
+    def _flush(self):
+        if self._buffer:
+            self._file.write(''.join(self._buffer))
+            self._file.flush()
+            self._buffer.clear()
+            self._buffer_size = 0
+        self._last_flush = monotonic()
+
+    def _flush_periodically(self):
+        while not self._closed.wait(self._flush_interval):
+            self.flush()
@@ -0,0 +1,146 @@
+import errno
+import shutil
+from datetime import datetime, timedelta
+from hashlib import sha1
+from os import chmod, link, listdir, makedirs, path, remove, replace, rmdir, stat, walk
+from stat import S_IREAD, S_IRGRP, S_IROTH, S_IWRITE
+from uuid import uuid4
+
+
+# cross-device links and file systems without hard links(FAT, some network shares), files are copied there
+_link_unsupported = {errno.EXDEV, errno.EPERM, errno.EINVAL, errno.ENOTSUP, errno.EOPNOTSUPP, errno.EMLINK,
+                     errno.ENOSYS}
+
+
+def _remove_readonly(func, fpath, _):
+    chmod(fpath, S_IWRITE)
+    func(fpath)
+
+
+class DistStore:
+    """ Content-addressed store of script contents shared by all run folders of a dist path.
+
+    Objects are keyed by their git blob hash and are read-only, run folders are made of hard links to them,
+    so a script is written to disk once however many runs deploy it. Where hard links are not supported
+    (e.g. FAT or some network shares) files are copied. Safe to call from several threads.
+    """
+    _chunk_size = 1024 * 1024
+
+    def __init__(self, dist_path, dirname='.store'):
+        self.dist_path = dist_path
+        self.root = path.join(dist_path, dirname)
+        self.can_link = True
+
+    def object_path(self, key):
+        return path.join(self.root, key[:2], key[2:])
+
+    def _tmp_path(self):
+        makedirs(self.root, exist_ok=True)
+        return path.join(self.root, f'{uuid4().hex}.tmp')
+
+    def _commit(self, tmp_path, key):
+        fpath = self.object_path(key)
+        makedirs(path.dirname(fpath), exist_ok=True)
+        chmod(tmp_path, S_IREAD | S_IRGRP | S_IROTH)
+        replace(tmp_path, fpath)
+        return fpath
+
+    def put(self, key, open_stream):
+        """ Path of the object, open_stream() is read only if the store doesn't have it yet """
+        fpath = self.object_path(key)
+        if path.exists(fpath):
+            return fpath
+        tmp_path = self._tmp_path()
+        with open(tmp_path, mode='wb') as f:
+            shutil.copyfileobj(open_stream(), f, self._chunk_size)
+        return self._commit(tmp_path, key)
+
+    def put_file(self, src_fpath):
+        """ Path of the object with the content of src_fpath, hashed the way git hashes blobs.
+        The file is copied only if the store doesn't have its content yet """
+        with open(src_fpath, mode='rb') as src:
+            digest = sha1(b'blob %d\0' % path.getsize(src_fpath))
+            for chunk in iter(lambda: src.read(self._chunk_size), b''):
+                digest.update(chunk)
+        key = digest.hexdigest()
+        fpath = self.object_path(key)
+        if path.exists(fpath):
+            return fpath
+        tmp_path = self._tmp_path()
+        shutil.copyfile(src_fpath, tmp_path)
+        return self._commit(tmp_path, key)
+
+    def link(self, object_fpath, dist_fpath):
+        """ Hard link(or copy) the object to dist_fpath. A target which is the object already is kept,
+        any other one is replaced """
+        if path.exists(dist_fpath) and path.samefile(object_fpath, dist_fpath):
+            return
+        if path.lexists(dist_fpath):
+            _remove_readonly(remove, dist_fpath, None)
+        if self.can_link:
+            try:
+                link(object_fpath, dist_fpath)
+                return
+            except FileExistsError:
+                # a script listed twice, linked by another thread in between
+                return self.link(object_fpath, dist_fpath)
+            except OSError as e:
+                if e.errno not in _link_unsupported:
+                    raise
+                self.can_link = False
+        shutil.copyfile(object_fpath, dist_fpath)
+
+    def runs(self, marker):
+        """ Run folders under the dist path, i.e. folders with a marker file, newest first """
+        runs = []
+        for dirpath, dirnames, filenames in walk(self.dist_path):
+            if dirpath == self.dist_path and path.basename(self.root) in dirnames:
+                dirnames.remove(path.basename(self.root))
+            if marker in filenames:
+                runs.append(dirpath)
+                dirnames.clear()
+        return sorted(runs, key=lambda run: stat(run).st_mtime, reverse=True)
+
+    def prune(self, marker, keep_runs=None, keep_days=None, current=None):
+        """ Remove run folders beyond the newest keep_runs or older than keep_days, then objects no run links to.
+        Returns the removed run folders """
+        current = current and path.abspath(current)
+        runs = [run for run in self.runs(marker) if path.abspath(run) != current]
+        expired = set()
+        if keep_runs is not None:
+            # the current run is one of the kept runs
+            expired.update(runs[max(keep_runs - (current is not None), 0):])
+        if keep_days is not None:
+            oldest = (datetime.now() - timedelta(days=keep_days)).timestamp()
+            expired.update(run for run in runs if stat(run).st_mtime < oldest)
+
+        for run in expired:
+            shutil.rmtree(run, onerror=_remove_readonly)
+            # run folders of branches with slashes in their names are nested
+            parent = path.dirname(run)
+            while path.abspath(parent) != path.abspath(self.dist_path) and not listdir(parent):
+                rmdir(parent)
+                parent = path.dirname(parent)
+        if expired:
+            self.collect_garbage()
+        return sorted(expired)
+
+    def collect_garbage(self):
+        """ Remove objects which are not linked from any run folder """
+        if not path.exists(self.root):
+            return
+        # leftovers of interrupted writes, a day old to spare the writes in progress
+        stale = (datetime.now() - timedelta(days=1)).timestamp()
+        for name in listdir(self.root):
+            fpath = path.join(self.root, name)
+            if name.endswith('.tmp'):
+                if stat(fpath).st_mtime < stale:
+                    remove(fpath)
+                continue
+            for object_name in listdir(fpath):
+                object_fpath = path.join(fpath, object_name)
+                if stat(object_fpath).st_nlink <= 1:
+                    chmod(object_fpath, S_IWRITE)
+                    remove(object_fpath)
+            if not listdir(fpath):
+                rmdir(fpath)
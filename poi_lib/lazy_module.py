@@ -0,0 +1,27 @@
+from importlib import import_module
+from threading import Lock
+
+
+class LazyModule:
+    """ Stand-in for a module that is imported on first attribute access.
+
+    Keeps the start of the app fast when heavy packages(git, psycopg2) are needed only by later phases.
+    PyInstaller doesn't see these imports, so frozen builds must list them as hidden imports.
+    """
+
+    def __init__(self, name):
+        self.__name = name
+        self.__module = None
+        self.__lock = Lock()
+
+    def __load(self):
+        with self.__lock:
+            if self.__module is None:
+                self.__module = import_module(self.__name)
+        return self.__module
+
+    def __getattr__(self, item):
+        return getattr(self.__module or self.__load(), item)
+
+    def __repr__(self):
+        return f'<lazy module {self.__name!r}{"" if self.__module is None else " (loaded)"}>'
@@ -0,0 +1,34 @@
+from threading import Event, Thread
+
+
+class BlockerWatch:
+    """ Polls probe() in a background thread while a statement runs and keeps its last non-empty result.
+
+    A session waiting for a lock is gone from pg_locks once lock_timeout cancels the wait, so the sessions
+    blocking it have to be looked up while it is still waiting. Errors of probe() are ignored, the watch must
+    never break the statement it watches.
+    """
+
+    def __init__(self, probe, interval):
+        self.probe = probe
+        self.interval = interval
+        self.blockers = []
+        self._stop = Event()
+        self._thread = Thread(target=self._poll, name=f'{self.__class__.__name__}', daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        return False
+
+    def _poll(self):
+        while not self._stop.wait(self.interval):
+            try:
+                blockers = self.probe()
+            except Exception:
+                continue
+            if blockers:
+                self.blockers = blockers
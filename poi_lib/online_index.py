@@ -0,0 +1,46 @@
+import re
+from collections import namedtuple
+
+from .sql_text import identifier, split_statements
+
+_annotation = re.compile(r'^\s*--\s*concurrent-index\s*$', re.IGNORECASE | re.MULTILINE)
+_name = r'(?:"(?:[^"]|"")+"|[A-Za-z_][\w$]*)'
+_create_index = re.compile(rf'^CREATE\s+(?P<unique>UNIQUE\s+)?INDEX\s+(?P<concurrently>CONCURRENTLY\s+)?'
+                           rf'(?P<if_not_exists>IF\s+NOT\s+EXISTS\s+)?(?P<name>{_name}\s+)?ON\s+(?P<only>ONLY\s+)?'
+                           rf'(?P<table>{_name}(?:\s*\.\s*{_name})?)', re.IGNORECASE)
+_index_keyword = re.compile(r'^(CREATE\s+(?:UNIQUE\s+)?INDEX)\s+', re.IGNORECASE)
+# statements allowed around the indexes of an index script, e.g. SET maintenance_work_mem
+_session_statement = re.compile(r'^(SET|RESET)\s', re.IGNORECASE)
+
+IndexStatement = namedtuple('IndexStatement', ['sql', 'original', 'index', 'table'])
+
+
+def _statement(statement):
+    match = _create_index.match(statement)
+    if match is None or match.group('only'):
+        return IndexStatement(statement, statement, None, None)
+    name = match.group('name')
+    if name is None:
+        # the invalid index a failed concurrent build leaves couldn't be told from the others of the table
+        return IndexStatement(statement, statement, None, match.group('table'))
+    concurrent = statement
+    if not match.group('concurrently'):
+        concurrent = _index_keyword.sub(r'\1 CONCURRENTLY ', statement, count=1)
+    return IndexStatement(concurrent, statement, identifier(name), match.group('table'))
+
+
+def online_index_statements(sql_text, detect=True):
+    """ Statements to run one by one outside of a transaction if the script should build its indexes concurrently,
+    None otherwise. A script qualifies if it is annotated with a '-- concurrent-index' line, or if detect is set
+    and it consists of CREATE INDEX statements(and SET/RESET). CREATE INDEX statements get CONCURRENTLY,
+    unnamed ones and those with ONLY keep their original form """
+    annotated = _annotation.search(sql_text) is not None
+    if not annotated and not detect:
+        return None
+    statements = [_statement(statement) for statement in split_statements(sql_text)]
+    if not annotated:
+        indexes = [s for s in statements if s.table is not None]
+        if not indexes or any(s.table is None and not _session_statement.match(s.original) for s in statements):
+            return None
+    return statements
+
@@ -0,0 +1,136 @@
+import json
+from concurrent.futures import ProcessPoolExecutor
+from functools import cache
+from itertools import repeat
+from os import makedirs, path, replace
+
+from .config_cache import user_cache_dir
+from .sql_text import dollar_quotes, line_number, unterminated
+
+# spawning worker processes costs more than checking a few scripts in place
+_pool_threshold = 64
+
+
+@cache
+def _pglast():
+    """ pglast package if it is installed, imported on first use as it loads the whole Postgresql parser """
+    try:
+        import pglast
+        import pglast.parser
+    except ImportError:
+        return None
+    return pglast
+
+
+def parser_name():
+    return 'lexer' if _pglast() is None else f'pglast {_pglast().__version__}'
+
+
+def check_sql(sql_text, single_statement=False):
+    """ Problems of a script as (line, message) pairs. Scripts are parsed with the Postgresql grammar
+    if pglast is installed, otherwise only unterminated quotes and comments are found """
+    problems = []
+    pglast = _pglast()
+    if pglast is not None:
+        try:
+            pglast.parser.parse_sql(sql_text)
+        except pglast.parser.ParseError as e:
+            location = getattr(e, 'location', None) or (e.args[1] if len(e.args) > 1 else 1)
+            problems.append((line_number(sql_text, max(location - 1, 0)), str(e.args[0] if e.args else e)))
+    else:
+        lexical = unterminated(sql_text)
+        if lexical is not None:
+            problems.append((line_number(sql_text, lexical[0]), f'unterminated {lexical[1]}'))
+
+    if single_statement:
+        for offset, tag in dollar_quotes(sql_text):
+            if not tag:
+                problems.append((line_number(sql_text, offset),
+                                 'untagged $$ quote ends the DO block of single mode, use a tag, e.g. $function$'))
+    return problems
+
+
+def check_file(fpath, encoding='UTF-8', single_statement=False):
+    try:
+        with open(fpath, mode='rt', encoding=encoding) as f:
+            sql_text = f.read()
+    except (OSError, UnicodeDecodeError) as e:
+        return [(1, f'{type(e).__name__}: {e}')]
+    return check_sql(sql_text, single_statement)
+
+
+class PreflightCache:
+    """ Check results keyed by script content hash, parser and mode, so unchanged scripts are never parsed again.
+    Keeps the max_entries most recently used results """
+
+    def __init__(self, fpath=None, max_entries=100000):
+        self.fpath = fpath or path.join(user_cache_dir(), 'preflight.json')
+        self.max_entries = max_entries
+        self._entries = {}
+        self._is_changed = False
+        try:
+            with open(self.fpath, mode='rt', encoding='UTF-8') as f:
+                self._entries = json.load(f)
+        except (OSError, ValueError):
+            pass
+
+    @staticmethod
+    def key(content_hash, single_statement):
+        return f'{parser_name()}|{int(single_statement)}|{content_hash}'
+
+    def get(self, key):
+        problems = self._entries.pop(key, None)
+        if problems is not None:
+            # most recently used entries are kept at the end, the order is saved along with new results
+            self._entries[key] = problems
+            return [tuple(problem) for problem in problems]
+        return None
+
+    def set(self, key, problems):
+        self._entries.pop(key, None)
+        self._entries[key] = problems
+        self._is_changed = True
+
+    def save(self):
+        if not self._is_changed:
+            return
+        entries = list(self._entries.items())[-self.max_entries:]
+        try:
+            makedirs(path.dirname(self.fpath), exist_ok=True)
+            tmp_path = f'{self.fpath}.tmp'
+            with open(tmp_path, mode='wt', encoding='UTF-8') as f:
+                json.dump(dict(entries), f)
+            replace(tmp_path, self.fpath)
+            self._is_changed = False
+        except OSError:
+            pass
+
+
+def preflight(scripts, single_statement=False, workers=None, encoding='UTF-8', cache=None):
+    """ Check (name, fpath, content_hash) scripts, the ones missing in cache in a process pool.
+    Returns (name, line, message) of every problem in script order """
+    results = {}
+    pending = []
+    for name, fpath, content_hash in scripts:
+        problems = None if cache is None else cache.get(PreflightCache.key(content_hash, single_statement))
+        if problems is None:
+            pending.append((name, fpath, content_hash))
+        else:
+            results[name] = problems
+
+    if pending:
+        fpaths = [fpath for _, fpath, _ in pending]
+        if workers == 1 or len(pending) < _pool_threshold:
+            checked = [check_file(fpath, encoding, single_statement) for fpath in fpaths]
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                checked = list(executor.map(check_file, fpaths, repeat(encoding), repeat(single_statement),
+                                            chunksize=max(len(fpaths) // (4 * (workers or 4)), 1)))
+        for (name, _, content_hash), problems in zip(pending, checked):
+            results[name] = problems
+            if cache is not None:
+                cache.set(PreflightCache.key(content_hash, single_statement), problems)
+
+    if cache is not None:
+        cache.save()
+    return [(name, line, message) for name, _, _ in scripts for line, message in results[name]]
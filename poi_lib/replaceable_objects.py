@@ -0,0 +1,31 @@
+import re
+from collections import namedtuple
+
+from .sql_text import identifier, split_statements
+
+_name = r'(?:"(?:[^"]|"")+"|[A-Za-z_][\w$]*)'
+_create_or_replace = re.compile(rf'^CREATE\s+OR\s+REPLACE\s+(?P<kind>FUNCTION|PROCEDURE|VIEW)\s+'
+                                rf'(?P<name>(?:(?P<schema>{_name})\s*\.\s*)?(?P<object>{_name}))', re.IGNORECASE)
+
+ReplaceableObject = namedtuple('ReplaceableObject', ['kind', 'schema', 'name', 'statement', 'name_span'])
+
+
+def replaceable_object(sql_text):
+    """ Function, procedure or view a script consists of, as a single CREATE OR REPLACE statement,
+    None for any other script. schema is None for an unqualified name """
+    statements = split_statements(sql_text)
+    if len(statements) != 1:
+        return None
+    match = _create_or_replace.match(statements[0])
+    if match is None:
+        return None
+    kind = match.group('kind').lower()
+    schema = match.group('schema') and identifier(match.group('schema'))
+    return ReplaceableObject('view' if kind == 'view' else 'function', schema, identifier(match.group('object')),
+                             statements[0], match.span('name'))
+
+
+def temp_copy(obj, temp_name):
+    """ The statement of obj creating it as pg_temp.<temp_name> instead """
+    start, end = obj.name_span
+    return f'{obj.statement[:start]}pg_temp.{temp_name}{obj.statement[end:]}'
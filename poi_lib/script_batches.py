@@ -0,0 +1,24 @@
+import re
+
+from .sql_text import split_statements
+
+# statements which control the transaction, can't run inside a transaction block or would outlive their script
+# in the implicit transaction of a multi-statement query
+_unbatchable = re.compile(r'^(?:BEGIN|START|COMMIT|END|ROLLBACK|ABORT|SAVEPOINT|RELEASE|PREPARE\s+TRANSACTION'
+                          r'|COMMIT\s+PREPARED|ROLLBACK\s+PREPARED|VACUUM|REINDEX|CLUSTER|CHECKPOINT|CALL|LOCK'
+                          r'|DISCARD|COPY|SET\s+(?:LOCAL|TRANSACTION)|(?:CREATE|DROP)\s+(?:DATABASE|TABLESPACE)'
+                          r'|(?:CREATE|ALTER|DROP)\s+SUBSCRIPTION|ALTER\s+SYSTEM'
+                          r'|(?:CREATE\s+(?:UNIQUE\s+)?|DROP\s+)INDEX\s+CONCURRENTLY'
+                          r'|ALTER\s+TYPE\s+\S+\s+ADD\s+VALUE)\b', re.IGNORECASE)
+
+
+def is_batchable(sql_text):
+    """ True if the script can share one multi-statement query with other scripts: a failure of the query
+    rolls back all of its scripts and nothing of a script leaks into the next ones """
+    statements = split_statements(sql_text)
+    return bool(statements) and not any(_unbatchable.match(statement) for statement in statements)
+
+
+def batch_payload(sql_texts):
+    """ Scripts joined into one query, a script may end with a -- comment or without a semicolon """
+    return '\n;\n'.join(sql_texts)
@@ -0,0 +1,137 @@
+import re
+
+_dollar_tag = re.compile(r'\$([A-Za-z_][\w]*)?\$')
+# positions where a quote, a comment or a dollar quote may start
+_special = re.compile(r'--|/\*|[\'"$]')
+_comment_delimiter = re.compile(r'/\*|\*/')
+_quote_stops = {'\'': re.compile("'"), '"': re.compile('"')}
+_escaped_quote_stop = re.compile(r"['\\]")
+
+
+def _scan(sql_text):
+    """ Split sql_text into (kind, start, end, is_closed) spans, kind is 'code', 'comment' or 'literal'(quoted strings,
+    quoted identifiers and dollar quoted bodies). An unterminated quote or comment runs to the end of the text """
+    i, start, n = 0, 0, len(sql_text)
+    while i < n:
+        # plain code is skipped by the regex engine, large scripts are mostly code and literals
+        special = _special.search(sql_text, i)
+        if special is None:
+            break
+        i = special.start()
+        char = sql_text[i]
+        end = None
+        kind = 'literal'
+        is_closed = True
+        if sql_text.startswith('--', i):
+            newline = sql_text.find('\n', i)
+            end, kind = (n if newline == -1 else newline), 'comment'
+        elif sql_text.startswith('/*', i):
+            depth, j = 1, i + 2
+            while depth:
+                delimiter = _comment_delimiter.search(sql_text, j)
+                if delimiter is None:
+                    j = n
+                    break
+                depth, j = depth + (1 if delimiter.group() == '/*' else -1), delimiter.end()
+            end, kind, is_closed = j, 'comment', depth == 0
+        elif char in '\'"':
+            escapes = char == '\'' and i > 0 and sql_text[i - 1] in 'eE' \
+                      and (i == 1 or not (sql_text[i - 2].isalnum() or sql_text[i - 2] == '_'))
+            stop = _escaped_quote_stop if escapes else _quote_stops[char]
+            j = i + 1
+            while j < n:
+                found = stop.search(sql_text, j)
+                if found is None:
+                    j = n
+                    break
+                j = found.start()
+                if sql_text[j] == '\\':
+                    j += 2
+                elif sql_text.startswith(char * 2, j):
+                    j += 2
+                else:
+                    break
+            end, is_closed = min(j + 1, n), j < n
+        elif char == '$' and (i == 0 or not (sql_text[i - 1].isalnum() or sql_text[i - 1] == '_')):
+            match = _dollar_tag.match(sql_text, i)
+            if match:
+                closing = sql_text.find(match.group(0), match.end())
+                end, is_closed = (n, False) if closing == -1 else (closing + len(match.group(0)), True)
+        if end is None:
+            i += 1
+            continue
+        if start < i:
+            yield 'code', start, i, True
+        yield kind, i, end, is_closed
+        i = start = end
+    if start < n:
+        yield 'code', start, n, True
+
+
+def strip_comments(sql_text):
+    """ sql_text without -- and /* */ comments, quoted text is kept as is """
+    return ''.join(' ' if kind == 'comment' else sql_text[start:end] for kind, start, end, _ in _scan(sql_text))
+
+
+def split_statements(sql_text):
+    """ Statements of a script split on semicolons outside of quotes and comments, comments are dropped """
+    statements, current = [], []
+    for kind, start, end, _ in _scan(sql_text):
+        if kind == 'comment':
+            current.append(' ')
+            continue
+        if kind == 'literal':
+            current.append(sql_text[start:end])
+            continue
+        *complete, rest = sql_text[start:end].split(';')
+        for part in complete:
+            current.append(part)
+            statements.append(''.join(current).strip())
+            current = []
+        current.append(rest)
+    statements.append(''.join(current).strip())
+    return [statement for statement in statements if statement]
+
+
+def split_top_level(sql_text, separator=','):
+    """ Parts of a statement split on separator outside of quotes, comments and parentheses """
+    parts, current, depth = [], [], 0
+    for kind, start, end, _ in _scan(sql_text):
+        if kind != 'code':
+            current.append(sql_text[start:end])
+            continue
+        for char in sql_text[start:end]:
+            if char == separator and depth == 0:
+                parts.append(''.join(current).strip())
+                current = []
+                continue
+            depth += {'(': 1, ')': -1}.get(char, 0)
+            current.append(char)
+    parts.append(''.join(current).strip())
+    return [part for part in parts if part]
+
+
+def dollar_quotes(sql_text):
+    """ (offset, tag) of every dollar quoted body, tag is '' for $$ """
+    return [(start, _dollar_tag.match(sql_text, start).group(1) or '') for kind, start, end, _ in _scan(sql_text)
+            if kind == 'literal' and sql_text[start] == '$']
+
+
+def unterminated(sql_text):
+    """ (offset, what) of a quote or comment which is never closed, None if there is none """
+    for kind, start, end, is_closed in _scan(sql_text):
+        if not is_closed:
+            if kind == 'comment':
+                return start, 'comment'
+            return start, {'\'': 'quoted string', '"': 'quoted identifier'}.get(sql_text[start], 'dollar quote')
+    return None
+
+
+def identifier(name):
+    """ Name as Postgresql stores it: quoted names are unquoted, unquoted ones are folded to lower case """
+    name = name.strip()
+    return name[1:-1].replace('""', '"') if name.startswith('"') else name.lower()
+
+
+def line_number(sql_text, offset):
+    return sql_text.count('\n', 0, offset) + 1
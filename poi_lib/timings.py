@@ -0,0 +1,96 @@
+import json
+from collections import namedtuple
+from contextlib import contextmanager
+from datetime import datetime
+from functools import wraps
+from threading import Lock
+from time import perf_counter
+
+PhaseTiming = namedtuple('PhaseTiming', ['name', 'started', 'duration'])
+ScriptTiming = namedtuple('ScriptTiming', ['script_path', 'target', 'started', 'duration', 'is_successful',
+                                           'backend_pid', 'rowcount'])
+
+
+class DeployTimings:
+    """ Wall time of deploy phases and executed scripts, safe to record from several threads """
+
+    def __init__(self):
+        self.started = datetime.now()
+        self.phases = []
+        self.scripts = []
+        self._lock = Lock()
+        self._origin = perf_counter()
+
+    @contextmanager
+    def phase(self, name):
+        started = perf_counter()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.phases.append(PhaseTiming(name, started - self._origin, perf_counter() - started))
+
+    @contextmanager
+    def script(self, script_path, target=None, connection=None):
+        """ Time one script execution, the yielded dict takes the cursor's rowcount """
+        info = {'rowcount': None}
+        with self.batch([script_path], [1], target, connection, info):
+            yield info
+
+    @contextmanager
+    def batch(self, script_paths, shares, target=None, connection=None, info=None):
+        """ Time scripts executed in one round trip, every script gets its share of the duration """
+        started = perf_counter()
+        is_successful = False
+        try:
+            yield
+            is_successful = True
+        finally:
+            duration = perf_counter() - started
+            backend_pid = connection.get_backend_pid() if connection is not None and not connection.closed else None
+            rowcount = None if info is None else info['rowcount']
+            with self._lock:
+                offset = started - self._origin
+                for script_path, share in zip(script_paths, shares):
+                    self.scripts.append(ScriptTiming(script_path, target, offset, duration * share, is_successful,
+                                                     backend_pid, rowcount))
+                    offset += duration * share
+
+    def duration(self, script_path, target=None):
+        """ Duration of the last execution of a script in seconds, None if it wasn't executed """
+        with self._lock:
+            for timing in reversed(self.scripts):
+                if timing.script_path == script_path and timing.target == target:
+                    return timing.duration
+        return None
+
+    def slowest_scripts(self, n):
+        with self._lock:
+            return sorted(self.scripts, key=lambda t: t.duration, reverse=True)[:n]
+
+    def as_dict(self):
+        with self._lock:
+            return {
+                'started': self.started.isoformat(),
+                'total': perf_counter() - self._origin,
+                'phases': [t._asdict() for t in self.phases],
+                'scripts': [t._asdict() for t in self.scripts]
+            }
+
+    def dump(self, fpath, encoding='UTF-8'):
+        with open(fpath, mode='wt', encoding=encoding) as f:
+            json.dump(self.as_dict(), f, ensure_ascii=False, indent=2)
+
+
+def timed(phase):
+    """ Method decorator recording the call as a phase in self.timings """
+
+    def decorator(method):
+        @wraps(method)
+        def wrapper(self, *args, **kwargs):
+            with self.timings.phase(phase):
+                return method(self, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
@@ -1,22 +1,40 @@
 from os import getenv, path, chmod, environ, makedirs, listdir
-from poi_lib import resource_path
+from poi_lib import resource_path, build_dependency_graph, DeployLog, DeployTimings, timed, LazyModule, \
+    ConfigValidationCache, DistStore, BlockerWatch, online_index_statements, preflight, PreflightCache, preflight_parser, \
+    replaceable_object, temp_copy, is_batchable, batch_payload, analyze_sql, is_blocking, regclass_text
 from dataclasses import dataclass
 
-environ['GIT_PYTHON_GIT_EXECUTABLE'] = path.abspath(resource_path(r'misc/PortableGit-2.45.0-64-bit/bin/git.exe'))
+_bundled_git = path.abspath(resource_path(r'misc/PortableGit-2.45.0-64-bit/bin/git.exe'))
+if path.exists(_bundled_git):
+    environ.setdefault('GIT_PYTHON_GIT_EXECUTABLE', _bundled_git)
 
-from git import Repo
 import shutil
+import io
 from stat import S_IWRITE
-from psycopg2 import connect, sql, errors
+from concurrent.futures import ThreadPoolExecutor, wait, as_completed, FIRST_COMPLETED
+from threading import Lock, local
+from itertools import product, groupby
+from functools import cache, partial
+from hashlib import sha256
+from argparse import ArgumentParser
+from uuid import uuid4
+from multiprocessing import freeze_support
+from time import monotonic, sleep
 import json
 from enum import Enum
 import sys
-from maskpass import askpass
 from datetime import datetime
 from termcolor import colored, cprint
-from colorama import just_fix_windows_console
 from collections import namedtuple
 
+# heavy packages are imported when the phase using them runs, see poi_lib.LazyModule
+git = LazyModule('git')
+psycopg2 = LazyModule('psycopg2')
+sql = LazyModule('psycopg2.sql')
+errors = LazyModule('psycopg2.errors')
+pg_pool = LazyModule('psycopg2.pool')
+maskpass = LazyModule('maskpass')
+
 
 class PropertiesValidator:
     __properties_dir = resource_path(r'configs')
@@ -30,20 +48,26 @@ class PropertiesValidator:
         },
         'db': {
             'connection': {
-                'host': str,
+                'host': (str, list),
                 'port': int,
-                'dbname': str,
+                'dbname': (str, list),
                 'user': str
             },
             'log_table': str
         },
         'misc': {'deploy_mode': str}
     }
+    __multi_value_keys = {'connection'}
 
-    def __init__(self):
+    def __init__(self, interactive=True, selected_config=None):
         self._valid_configs = []
         self._invalid_configs = []
         self._selected_config = None
+        self._interactive = interactive
+        self._requested_config = selected_config
+
+    def _ask(self):
+        return input().strip() if self._interactive else ''
 
     @property
     def valid_configs(self):
@@ -57,13 +81,19 @@ class PropertiesValidator:
         if not path.exists(self.__properties_dir):
             raise FileNotFoundError(f'Folder {self.__properties_dir} not found.')
 
+        validation_cache = ConfigValidationCache(self._structure_fingerprint())
         for filename in sorted(listdir(self.__properties_dir)):
             if filename.endswith('.json'):
                 file_path = path.join(self.__properties_dir, filename)
-                if self._is_valid_property(file_path):
+                is_valid = validation_cache.get(file_path)
+                if is_valid is None:
+                    is_valid = self._is_valid_property(file_path)
+                    validation_cache.set(file_path, is_valid)
+                if is_valid:
                     self._valid_configs.append(filename)
                 else:
                     self._invalid_configs.append(filename)
+        validation_cache.save()
         print(colored(f'Invalid config files:\n{self.invalid_configs}', 'red', attrs=['bold']))
         print(colored(f'Valid config files:\n{self.valid_configs}', 'light_green', attrs=['bold']))
 
@@ -73,6 +103,11 @@ class PropertiesValidator:
             return self._prompt_user_selection()
         raise FileNotFoundError('No valid configuration files found.')
 
+    @classmethod
+    def _structure_fingerprint(cls):
+        """Changes with the expected structure, so cached validation results of older versions are dropped"""
+        return sha256(repr((cls.__default_structure, sorted(cls.__multi_value_keys))).encode()).hexdigest()
+
     @staticmethod
     def load_config(file_path):
         with open(file_path, 'r', encoding='utf-8') as f:
@@ -93,7 +128,8 @@ class PropertiesValidator:
             if key not in data:
                 return False
             if isinstance(expected_type, dict):
-                if not self._validate_structure(data[key], expected_type):
+                items = data[key] if key in self.__multi_value_keys and isinstance(data[key], list) else [data[key]]
+                if not items or not all(self._validate_structure(item, expected_type) for item in items):
                     return False
             elif not isinstance(data[key], expected_type):
                 return False
@@ -101,7 +137,12 @@ class PropertiesValidator:
 
     def _prompt_user_selection(self):
         cprint('Enter the configuration file name (or press Enter to use the default): ', 'cyan')
-        user_choice = input().strip()
+        user_choice = self._requested_config or self._ask()
+        if user_choice and user_choice not in self._valid_configs:
+            if not self._interactive:
+                # the default config may point at another database
+                raise FileNotFoundError(f'Config file {user_choice} is not valid or not found')
+            cprint(f'Config file {user_choice} is not valid or not found', 'red')
         if user_choice and user_choice in self._valid_configs:
             self._selected_config = user_choice
             cprint(f'Selected file: {self._selected_config}', 'light_green')
@@ -114,30 +155,108 @@ class PropertiesValidator:
 
 class PostgresObjInstaller:
     __log_file = r'install.log'
+    __timings_file = r'timings.json'
     __prompts_default = ['cyan', None, ['bold']]
     __encoding = r'UTF-8'
     __inst_file = r'objects.inst'
     __revert_file = r'objects.revert'
     __single_transaction_filename = r'cur_install.sql'
-
-    def __init__(self, properties: dict):
+    __single_statement_start = r'misc/start_single_statement.txt'
+    __single_statement_end = r'misc/end_single_statement.txt'
+    __single_statement_separator = b'\n\n'
+    __copy_sidecar_suffix = r'.copy.json'
+    __copy_delimiters = {'.csv': ',', '.tsv': '\t'}
+    __copy_chunk_size = 1024 * 1024
+    __lock_retry_max_delay = 60
+    __fingerprint_batch_size = 200
+    __diff_root = r'OBJ'
+    __diff_object_order = ('extensions', 'types', 'domains', 'sequences', 'tables', 'functions', 'procedures',
+                           'views', 'materializedviews', 'triggers')
+
+    def __init__(self, properties: dict, force: bool = False, resume: bool = False, interactive: bool = True):
 
         self.repo_properties = self.RepositoryProperties(properties['repo'])
-        self.db_properties = self.PGConnectionProperties(properties['db']['connection'])
-        self.repo_properties.revert_branch = None
+        self.db_targets = [self.PGConnectionProperties(target)
+                           for target in self._expand_targets(properties['db']['connection'])]
+        self.db_properties = self.db_targets[0]
+        self.repo_properties.revert_branch = properties['repo'].get('revert_branch')
         self.repo = None
+        self.connection = None
         self.script_list = None
+        self.deleted_objects = []
+        self.__target_paths = None
         self.deploy_mode = self.DeployMode(properties['misc']['deploy_mode']).value
+        self.parallel_workers = properties['misc'].get('parallel_workers', 1)
+        self.fanout_workers = properties['misc'].get('fanout_workers', 4)
+        self.io_workers = properties['misc'].get('io_workers', 8)
+        self.transaction_batch_size = properties['misc'].get('transaction_batch_size', 0)
+        self.log_format = self.LogFormat(properties['misc'].get('log_format', 'text')).value
+        self.timings_top = properties['misc'].get('timings_top', 10)
+        self.lock_timeout = properties['misc'].get('lock_timeout')
+        self.statement_timeout = properties['misc'].get('statement_timeout')
+        self.lock_retry_deadline = properties['misc'].get('lock_retry_deadline', 300)
+        self.lock_retry_delay = properties['misc'].get('lock_retry_delay', 1)
+        self.concurrent_indexes = properties['misc'].get('concurrent_indexes', False)
+        self.preflight = properties['misc'].get('preflight', True)
+        self.preflight_workers = properties['misc'].get('preflight_workers')
+        self.skip_identical_objects = properties['misc'].get('skip_identical_objects', False)
+        self.script_batch_size = properties['misc'].get('script_batch_size', 1)
+        self.script_batch_bytes = properties['misc'].get('script_batch_bytes', 64 * 1024)
+        self.heavy_ddl_policy = properties['misc'].get('heavy_ddl_policy', self.HeavyDdlPolicy.REPORT.value)
+        self.heavy_ddl_threshold_mb = properties['misc'].get('heavy_ddl_threshold_mb', 1024)
+        self.maintenance_window = properties['misc'].get('maintenance_window')
+        self.timings = DeployTimings()
         self.deploy_type = self.DeployType.RELEASE.value
         self.log_table = properties['db']['log_table']
+        self.ledger_table = properties['db'].get('ledger_table', f'{self.log_table}_scripts')
+        self.ledger_retention_days = properties['db'].get('ledger_retention_days')
+        self.force = force
+        self.interactive = interactive
+        self.resume = resume
+        self.run_id = str(uuid4())
         self.__dist_folder_name = None
         self.__release_branch = None
         self.__revert_branch = None
+        self.__release_commit = None
+        self.__revert_commit = None
+        self.__blobs = None
+        self.__script_hashes = {}
+        self.__history_indexed = set()
+        self.__ledger_unavailable = set()
+        self.__log_lock = Lock()
+        self.__deploy_log = None
+        self.__target_connections = {}
+        self.__credentials_asked = False
+        self.listeners = []
+        self.__target = local()
+        self.__dist_store = None
+        self.__copy_specs = {}
+        self.__session_settings = set()
+        self.__index_builds = None
+        self.__monitor_connections = {}
+        self.__monitor_lock = Lock()
 
     def __setattr__(self, key, value):
         if (key in self.__dict__ and value != '') or key not in self.__dict__:
             object.__setattr__(self, key, value)
 
+    @staticmethod
+    def _expand_targets(connection):
+        """Turn a connection, a list of them or a template with lists of hosts/dbnames into single targets"""
+        targets = []
+        for template in connection if isinstance(connection, list) else [connection]:
+            values = [v if isinstance(v, list) else [v] for v in template.values()]
+            targets.extend(dict(zip(template, combination)) for combination in product(*values))
+        return targets
+
+    @property
+    def _target_label(self):
+        return getattr(self.__target, 'label', None)
+
+    @_target_label.setter
+    def _target_label(self, value):
+        self.__target.label = value
+
     def __deploy_type_file_map(self, deploy_type):
         if deploy_type == self.DeployType.RELEASE.value:
             return self.__inst_file
@@ -157,6 +276,46 @@ class PostgresObjInstaller:
     class DeployMode(Enum):
         SEPARATE_STATEMENTS = 'separate'
         SINGLE_STATEMENT = 'single'
+        TRANSACTIONAL = 'transactional'
+
+    class SyncMode(Enum):
+        CLONE = 'clone'
+        FETCH = 'fetch'
+
+    class MaterializeMode(Enum):
+        CHECKOUT = 'checkout'
+        OBJECTS = 'objects'
+
+    class LogFormat(Enum):
+        TEXT = 'text'
+        JSON = 'json'
+
+    class ScriptSource(Enum):
+        INST_FILE = 'inst'
+        DIFF = 'diff'
+
+    class DistStoreMode(Enum):
+        LINK = 'link'
+        COPY = 'copy'
+
+    class HeavyDdlPolicy(Enum):
+        REPORT = 'report'
+        LAST = 'last'
+        WINDOW = 'window'
+        REFUSE = 'refuse'
+
+    @property
+    def _dist_store(self):
+        """Content-addressed store run folders are linked from, None if scripts are copied into every run folder"""
+        if self.DistStoreMode(self.repo_properties.dist_store) == self.DistStoreMode.COPY:
+            return None
+        if self.__dist_store is None or self.__dist_store.dist_path != self.repo_properties.dist_path:
+            self.__dist_store = DistStore(self.repo_properties.dist_path)
+        return self.__dist_store
+
+    @property
+    def _from_objects(self):
+        return self.MaterializeMode(self.repo_properties.materialize) == self.MaterializeMode.OBJECTS
 
     @dataclass
     class RepositoryProperties:
@@ -166,6 +325,14 @@ class PostgresObjInstaller:
         dist_path: str
         release_branch: str
         folder: str
+        sync: str = 'clone'
+        clone_depth: int | None = None
+        clone_filter: str | None = None
+        materialize: str = 'checkout'
+        script_source: str = 'inst'
+        dist_store: str = 'link'
+        dist_keep_runs: int | None = None
+        dist_keep_days: int | None = None
 
         def __init__(self, properties_dict):
             for k, v in properties_dict.items():
@@ -203,46 +370,147 @@ class PostgresObjInstaller:
         def as_dict(self):
             return {k: v for k, v in self.__dict__.items() if not callable(v)}
 
-    def log_and_print(self, message, color, attrs=None):
-        with open(f'{self.repo_properties.dist_path}/{self.__dist_folder_name}/{self.__log_file}', mode='a',
-                  encoding=self.__encoding) as f:
-            f.write(f'{datetime.now()}: {message}\n')
+        @property
+        def label(self):
+            return f'{self.host}:{self.port}/{self.dbname}'
 
-        cprint(message, color=color, attrs=attrs)
+    @property
+    def deploy_log(self):
+        fpath = path.abspath(f'{self.repo_properties.dist_path}/{self.__dist_folder_name}/{self.__log_file}')
+        if self.__deploy_log is None or self.__deploy_log.fpath != fpath:
+            if self.__deploy_log is not None:
+                self.__deploy_log.close()
+            self.__deploy_log = DeployLog(fpath, self.__encoding,
+                                          json_lines=self.log_format == self.LogFormat.JSON.value)
+        return self.__deploy_log
+
+    def close_log(self):
+        """Flush and close the deploy log, stopping its flusher thread; a later message opens it again"""
+        if self.__deploy_log is not None:
+            self.__deploy_log.close()
+            self.__deploy_log = None
+
+    def _ask(self):
+        """Answer to a prompt, empty(i.e. keep the default) in non-interactive mode"""
+        return input().strip() if self.interactive else ''
+
+    def _ask_password(self):
+        if self.interactive:
+            return maskpass.askpass(prompt=colored(f'Enter the password for db connection\n', 'blue'))
+        return getenv('POI_DB_PASSWORD', getenv('PGPASSWORD', ''))
+
+    def log_and_print(self, message, color, attrs=None):
+        label = self._target_label
+        with self.__log_lock:
+            deploy_log = self.deploy_log
+            cprint(message if label is None else f'[{label}] {message}', color=color, attrs=attrs)
+        deploy_log.write(message, 'error' if color == 'red' else 'info', target=label)
+        for listener in self.listeners:
+            listener(message if label is None else f'[{label}] {message}', color)
 
     def clone_repo(self):
 
         cprint(f'Enter the remote repo path, default is: {self.repo_properties.remote_path}', *self.__prompts_default)
-        self.repo_properties.remote_path = input().strip()
+        self.repo_properties.remote_path = self._ask()
 
         cprint(f'Remote repo path is set to {self.repo_properties.remote_path}', 'light_green')
 
         cprint(f'Enter the local path where repo will be cloned, default is: {self.repo_properties.local_path}',
                *self.__prompts_default)
-        self.repo_properties.local_path = input().strip()
+        self.repo_properties.local_path = self._ask()
 
         cprint(f'Local repo path is set to {self.repo_properties.local_path}', 'light_green')
 
-        def remove_readonly(func, fpath, *args):
-            chmod(fpath, S_IWRITE)
-            func(fpath)
+        self._sync_repo()
+        return self
+
+    @timed('clone_repo')
+    def _sync_repo(self):
+        if self.SyncMode(self.repo_properties.sync) == self.SyncMode.FETCH:
+            self.repo = self._open_existing_repo()
+
+        if self.repo is None:
+            def remove_readonly(func, fpath, *args):
+                chmod(fpath, S_IWRITE)
+                func(fpath)
+
+            try:
 
+                cprint(f'Folder will be overwritten: {self.repo_properties.local_path}', 'red', attrs=['bold'])
+                shutil.rmtree(self.repo_properties.local_path, onerror=remove_readonly)
+            except FileNotFoundError:
+                pass
+
+            cprint('Cloning repository...', 'yellow')
+            self.repo = git.Repo.clone_from(self.repo_properties.remote_path, self.repo_properties.local_path,
+                                        **self._clone_options())
+            cprint('Repository cloned successfully', 'light_green', attrs=['bold'])
+
+    def _clone_options(self):
+        options = {}
+        if self.repo_properties.clone_depth:
+            options['depth'] = self.repo_properties.clone_depth
+            options['no_single_branch'] = True
+        if self.repo_properties.clone_filter:
+            options['filter'] = self.repo_properties.clone_filter
+        return options
+
+    def _fetch_options(self):
+        if self.repo_properties.clone_depth:
+            return {'depth': self.repo_properties.clone_depth}
+        return {}
+
+    def _open_existing_repo(self):
+        """Reuse the clone at local_path if it is valid and points at remote_path, None otherwise"""
         try:
+            repo = git.Repo(self.repo_properties.local_path)
+            urls = [url.rstrip('/') for url in repo.remotes.origin.urls]
+        except (git.exc.InvalidGitRepositoryError, git.exc.NoSuchPathError, git.exc.GitCommandError, AttributeError,
+                ValueError):
+            cprint('Local repository is missing or corrupt, it will be cloned again', 'yellow')
+            return None
 
-            cprint(f'Folder will be overwritten: {self.repo_properties.local_path}', 'red', attrs=['bold'])
-            shutil.rmtree(self.repo_properties.local_path, onerror=remove_readonly)
-        except FileNotFoundError:
-            pass
+        if self.repo_properties.remote_path.rstrip('/') not in urls:
+            cprint(f'Local repository points at a different remote: {", ".join(urls)}', 'yellow')
+            return None
 
-        cprint('Cloning repository...', 'yellow')
-        self.repo = Repo.clone_from(self.repo_properties.remote_path, self.repo_properties.local_path)
-        cprint('Repository cloned successfully', 'light_green', attrs=['bold'])
-        return self
+        try:
+            cprint('Fetching new refs...', 'yellow')
+            repo.remotes.origin.fetch(prune=True, **self._fetch_options())
+            repo.git.reset('--hard')
+            repo.git.clean('-fdx')
+        except git.exc.GitCommandError as e:
+            cprint(f'Failed to sync local repository, it will be cloned again:\n{e}', 'yellow')
+            repo.close()
+            return None
+
+        cprint('Repository synced successfully', 'light_green', attrs=['bold'])
+        return repo
+
+    def _remote_heads(self):
+        return {ref.remote_head for ref in self.repo.remotes.origin.refs}
+
+    def _ensure_revision(self, rev):
+        """Fetch rev from origin if it is not present locally, e.g. a commit outside of a shallow history"""
+        if rev in self._remote_heads():
+            return
+        try:
+            self.repo.rev_parse(rev)
+        except (git.exc.BadName, ValueError):
+            cprint(f'Fetching {rev} from origin...', 'yellow')
+            self.repo.remotes.origin.fetch(rev, **self._fetch_options())
+
+    def _checkout(self, rev):
+        self._ensure_revision(rev)
+        if rev in self._remote_heads():
+            self.repo.git.checkout('-f', '-B', rev, f'origin/{rev}')
+        else:
+            self.repo.git.checkout('-f', rev)
 
     def handle_deploy_path(self):
         cprint(f'Select deploy type (release/revert) '
                f'Default type is: {self.deploy_type}', color='cyan', attrs=['bold'])
-        self.deploy_type = input().strip()
+        self.deploy_type = self._ask()
         cprint(f'Deploy type is set to {self.DeployType(self.deploy_type).value}', 'light_green')
 
         if self.deploy_type == self.DeployType.RELEASE.value:
@@ -250,6 +518,13 @@ class PostgresObjInstaller:
             self.create_dist_folder()
             self.check_folder_and_scripts()
             self.copy_scripts_to_dist_path()
+        elif self._from_objects:
+            # both stages are resolved from their commits in a single pass, no checkout needed
+            self.switch_to_release_branch()
+            self.switch_to_revert_branch()
+            self.create_dist_folder()
+            self.check_folder_and_scripts()
+            self.copy_scripts_to_dist_path()
         else:  # self.deploy_type == self.DeployType.REVERT.value
             self.switch_to_release_branch()
             self.create_dist_folder()
@@ -257,11 +532,14 @@ class PostgresObjInstaller:
             self.copy_scripts_to_dist_path(self.RevertStage.ONE.value)
             self.switch_to_revert_branch()
             self.copy_scripts_to_dist_path(self.RevertStage.TWO.value)
+        self.prune_dist_path()
         return self
 
     def create_dist_folder(self):
         _format = '%Y-%d-%m %H.%M.%S'
-        self.dist_folder_name = f'{self.deploy_type} {self.get_branch()} {datetime.now().strftime(_format)}'
+        # folders and daemon jobs prepared within the same second get folders of their own by the run id
+        self.dist_folder_name = f'{self.deploy_type} {self.__release_branch} {datetime.now().strftime(_format)} ' \
+                                f'{self.run_id[:8]}'
         makedirs(path.abspath(
             fr'{self.repo_properties.dist_path}/{self.dist_folder_name}'))
 
@@ -269,89 +547,302 @@ class PostgresObjInstaller:
 
         cprint(f'Enter a release branch name or commit SHA-1, default branch is: {self.repo_properties.release_branch}',
                *self.__prompts_default)
-        self.repo_properties.release_branch = input().strip()
+        self.repo_properties.release_branch = self._ask()
         cprint(f'Release branch/SHA-1 is set to {self.repo_properties.release_branch}', 'light_green')
-        cprint('Checking out...', 'yellow')
-        self.repo.git.checkout(self.repo_properties.release_branch)
-        cprint('Checkout is successful', 'light_green')
-        self.__release_branch = self.get_branch()
+        self.__release_branch, self.__release_commit = self._switch_to(self.repo_properties.release_branch)
 
     def switch_to_revert_branch(self):
 
         cprint(f'Enter a revert branch name or commit SHA-1, default branch is: {self.repo_properties.revert_branch}',
                *self.__prompts_default)
-        self.repo_properties.revert_branch = input().strip()
+        self.repo_properties.revert_branch = self._ask()
         cprint(f'Revert branch/SHA-1 is set to {self.repo_properties.revert_branch}', 'light_green')
+        self.__revert_branch, self.__revert_commit = self._switch_to(self.repo_properties.revert_branch)
+
+    @timed('checkout')
+    def _switch_to(self, rev):
+        if self._from_objects:
+            self._ensure_revision(rev)
+            commit = self.repo.commit(f'origin/{rev}' if rev in self._remote_heads() else rev)
+            cprint(f'Resolved {rev} to commit {commit}', 'light_green')
+            return (f'{commit}' if commit.hexsha.startswith(rev) else f'{rev} {commit}'), commit
+
         cprint('Checking out...', 'yellow')
-        self.repo.git.checkout(self.repo_properties.revert_branch)
+        self._checkout(rev)
         cprint('Checkout is successful', 'light_green')
-        self.__revert_branch = self.get_branch()
+        return self.get_branch(), self.repo.head.commit
 
     Script = namedtuple('Script', ['repo_fpath', 'content_fpath', 'dist_fpath'])
+    CopySpec = namedtuple('CopySpec', ['table', 'columns', 'header', 'delimiter', 'null', 'truncate', 'raw'])
 
-    def check_scripts(self, script_list: list['Script']):
+    def _script_commit(self, script):
+        if self.__revert_commit is not None and script.content_fpath.startswith('OBJ'):
+            return self.__revert_commit
+        return self.__release_commit
+
+    def _resolve_blobs(self, script_list: list['Script']):
+        """Look up the blob of every script in the tree of the commit it is taken from, None if it is absent"""
+        trees = {}
+
+        def subtree(commit, dirname):
+            if (commit, dirname) not in trees:
+                parent, _, name = dirname.rpartition('/')
+                trees[commit, dirname] = subtree(commit, parent) / name if dirname else commit.tree
+            return trees[commit, dirname]
+
+        blobs = {}
         for script in script_list:
-            if not path.exists(script.repo_fpath):
+            commit = self._script_commit(script)
+            dirname, _, name = script.content_fpath.replace('\\', '/').strip('/').rpartition('/')
+            try:
+                blobs[script.content_fpath] = subtree(commit, dirname) / name
+            except KeyError:
+                blobs[script.content_fpath] = None
+        return blobs
+
+    @timed('check_scripts')
+    def check_scripts(self, script_list: list['Script']):
+        # data files are checked together with their sidecars, which aren't deployed themselves
+        sidecars = [self._copy_sidecar(script) for script in script_list if self._is_data_file(script)]
+        checked = script_list + sidecars
+        if self._from_objects:
+            self.__blobs = self._resolve_blobs(checked)
+            exists = [self.__blobs[script.content_fpath] is not None for script in checked]
+        else:
+            exists = self._io_map(lambda script: path.exists(script.repo_fpath), checked)
+
+        missing = [script for script, is_present in zip(checked, exists) if not is_present]
+        if missing:
+            for script in missing:
                 self.log_and_print(f'Specified script doesn\'t exist {script.content_fpath}', 'red')
-                self.log_and_print('Fill objects.inst file with correct script paths and try again', 'red')
-                sys.exit()
+            self.log_and_print(f'{len(missing)} of {len(checked)} scripts not found. '
+                               f'Fill objects.inst file with correct script paths and try again', 'red')
+            sys.exit(1)
+
+        invalid = False
+        for script, sidecar in zip((s for s in script_list if self._is_data_file(s)), sidecars):
+            try:
+                self.__copy_specs[script.content_fpath] = self._load_copy_spec(script, sidecar)
+            except (ValueError, KeyError, TypeError, AttributeError) as e:
+                self.log_and_print(f'Invalid copy sidecar {sidecar.content_fpath}: {e!r}', 'red')
+                invalid = True
+        if invalid:
+            sys.exit(1)
         return script_list
 
+    def _data_file_indices(self, script_list: list['Script']):
+        return {i for i, script in enumerate(script_list) if self._is_data_file(script)}
+
+    def _is_data_file(self, script):
+        return path.splitext(script.content_fpath)[1].lower() in self.__copy_delimiters
+
+    def _copy_sidecar(self, script):
+        return self.Script(*(f'{fpath}{self.__copy_sidecar_suffix}' for fpath in script))
+
+    def _load_copy_spec(self, script, sidecar):
+        """Target table and COPY options of a data file, from its sidecar, e.g. users.csv.copy.json:
+        {"table": "main.users", "columns": ["id", "name"], "header": true, "delimiter": ",", "null": "",
+        "truncate": false}, only table is required"""
+        if self.__blobs is None:
+            with open(sidecar.repo_fpath, mode='rb') as f:
+                raw = f.read()
+        else:
+            raw = self.__blobs[sidecar.content_fpath].data_stream.read()
+        options = json.loads(raw.decode(self.__encoding))
+        table = options['table']
+        if not isinstance(table, str) or not table:
+            raise ValueError('table must be a non-empty "schema.table" string')
+        columns = options.get('columns')
+        if columns is not None and not all(isinstance(column, str) for column in columns):
+            raise ValueError('columns must be a list of column names')
+        delimiter = options.get('delimiter', self.__copy_delimiters[path.splitext(script.content_fpath)[1].lower()])
+        return self.CopySpec(table, columns, bool(options.get('header', True)), delimiter, options.get('null'),
+                             bool(options.get('truncate', False)), raw)
+
+    def _io_map(self, func, items):
+        """func results for items in their order, computed by up to io_workers threads"""
+        items = list(items)
+        if self.io_workers <= 1 or len(items) <= 1:
+            return [func(item) for item in items]
+        with ThreadPoolExecutor(max_workers=min(self.io_workers, len(items)), thread_name_prefix='poi-io') as executor:
+            return list(executor.map(func, items))
+
     def check_folder_and_scripts(self):
 
         cprint(
             f'Enter a subfolder name of Requests catalog(must contain {self.__deploy_type_file_map(self.deploy_type)} file)'
             f', default folder is: {self.repo_properties.folder}', *self.__prompts_default)
-        self.repo_properties.folder = input().strip()
+        self.repo_properties.folder = self._ask()
 
         cprint(f'Folder is set to {self.repo_properties.folder}', 'light_green')
 
-        inst_path = path.abspath(
-            fr'{self.repo_properties.local_path}/Requests/{self.repo_properties.folder}/{self.__deploy_type_file_map(self.deploy_type)}')
+        lines = None
+        if self.ScriptSource(self.repo_properties.script_source) == self.ScriptSource.DIFF \
+                and self.deploy_type == self.DeployType.RELEASE.value:
+            lines = self._diff_target_paths()
+        if lines is None:
+            lines = self._inst_script_paths()
 
-        with open(inst_path, mode='rt', encoding=self.__encoding) as f:
-            file_paths = [self.Script(path.abspath(fr'{self.repo_properties.local_path}/{line.rstrip()}')
-                                      , line.rstrip()
-                                      , path.abspath(
-                    fr'{self.repo_properties.dist_path}/{self.dist_folder_name}/{line.rstrip()}'))
-                          for line in f if not line.startswith('#')]
+        file_paths = [self.Script(path.abspath(fr'{self.repo_properties.local_path}/{line.rstrip()}')
+                                  , line.rstrip()
+                                  , path.abspath(
+                fr'{self.repo_properties.dist_path}/{self.dist_folder_name}/{line.rstrip()}'))
+                      for line in lines if not line.startswith('#')]
 
         self.script_list = self.check_scripts(file_paths)
         self.log_and_print(f'List of deploy scripts created successfully', 'light_green')
 
+    @timed('read_script_list')
+    def _inst_script_paths(self):
+        inst_rel_path = f'Requests/{self.repo_properties.folder}/{self.__deploy_type_file_map(self.deploy_type)}'
+
+        if self._from_objects:
+            return (self.__release_commit.tree / inst_rel_path).data_stream.read() \
+                .decode(self.__encoding).splitlines()
+
+        with open(path.abspath(fr'{self.repo_properties.local_path}/{inst_rel_path}'), mode='rt',
+                  encoding=self.__encoding) as f:
+            return f.readlines()
+
+    def _diff_order_key(self, fpath):
+        parts = [part.lower() for part in fpath.split('/')]
+        for i, folder in enumerate(self.__diff_object_order, start=1):
+            if folder in parts:
+                return i, fpath
+        return 0, fpath
+
+    @timed('diff_script_list')
+    def _diff_target_paths(self):
+        """Paths of the scripts of every target, each computed against the last release logged in its own database.
+        Returns the union of them in order, None if all targets use the inst file"""
+        target_hashes, paths_by_hash = {}, {}
+        for target in self.db_targets:
+            self._target_label = target.label if len(self.db_targets) > 1 else None
+            try:
+                last_hash = self._last_deployed_commit(self._target_connection(target))
+            except psycopg2.Error as e:
+                # the target fails on connecting again at the deploy, it gets all paths meanwhile
+                self.log_and_print(f'Last release can\'t be looked up: {e}', 'red')
+                continue
+            finally:
+                self._target_label = None
+            if last_hash not in paths_by_hash:
+                paths_by_hash[last_hash] = self._diff_script_paths(last_hash, target.label)
+            target_hashes[target.label] = last_hash
+
+        if all(paths is None for paths in paths_by_hash.values()):
+            return None
+        lines = {}
+        for last_hash, paths in paths_by_hash.items():
+            if paths is None:
+                paths_by_hash[last_hash] = paths = [line.rstrip() for line in self._inst_script_paths()
+                                                    if not line.startswith('#')]
+            lines.update(dict.fromkeys(paths))
+        if len(paths_by_hash) > 1:
+            self.__target_paths = {label: paths_by_hash[last_hash] for label, last_hash in target_hashes.items()}
+        return list(lines)
+
+    def _diff_script_paths(self, last_hash, label):
+        """Paths of .sql objects changed between the last successful release and the release commit"""
+        if last_hash is None:
+            self.log_and_print(f'[{label}] No successful release found in {self.log_table}, '
+                               f'{self.__deploy_type_file_map(self.deploy_type)} file is used instead', 'yellow')
+            return None
+
+        self._ensure_revision(last_hash)
+        cprint(f'Computing changed objects between {last_hash} and {self.__release_commit}...', 'yellow')
+        changed = []
+        for diff in self.repo.commit(last_hash).diff(self.__release_commit, paths=self.__diff_root):
+            if diff.change_type in ('D', 'R') and diff.a_path.endswith('.sql'):
+                self.log_and_print(f'Object was deleted or renamed since {last_hash}, it will not be deployed: '
+                                   f'{diff.a_path}', 'yellow')
+                if diff.a_path not in self.deleted_objects:
+                    self.deleted_objects.append(diff.a_path)
+            if diff.change_type != 'D' and diff.b_path.endswith('.sql'):
+                changed.append(diff.b_path)
+
+        self.log_and_print(f'Changed objects since {last_hash}: {len(changed)}', 'light_green')
+        return sorted(changed, key=self._diff_order_key)
+
+    def _target_scripts(self):
+        """Script list of the current target, in diff mode targets with different last releases get different ones"""
+        if self.__target_paths is None or self._target_label not in self.__target_paths:
+            return self.script_list
+        scripts = {script.content_fpath: script for script in self.script_list}
+        return [scripts[fpath] for fpath in self.__target_paths[self._target_label] if fpath in scripts]
+
+    @timed('copy_scripts_to_dist_path')
     def copy_scripts_to_dist_path(self, revert_stage=RevertStage.ZERO.value):
 
         if revert_stage == self.RevertStage.ZERO.value:
             cprint('Copying scripts to dist path...', 'yellow')
-            for script in self.script_list:
-                makedirs(path.dirname(script.dist_fpath), exist_ok=True)
-                shutil.copy(script.repo_fpath, script.dist_fpath)
-            else:
-                cprint('Scripts copied successfully', 'light_green')
-                cprint(fr'Deployment scripts location is {self.repo_properties.dist_path}\{self.dist_folder_name}',
-                       'light_magenta')
+            self._materialize_all(self.script_list)
+            cprint('Scripts copied successfully', 'light_green')
+            cprint(fr'Deployment scripts location is {self.repo_properties.dist_path}\{self.dist_folder_name}',
+                   'light_magenta')
 
         elif revert_stage == self.RevertStage.ONE.value:
-            stage_flag = False
-            for i, script in enumerate(s for s in self.script_list if s.content_fpath.startswith('Requests')):
-                if i == 0:
-                    cprint('Copying first stage scripts to dist path...', 'yellow')
-                    stage_flag = True
-                makedirs(path.dirname(script.dist_fpath), exist_ok=True)
-                shutil.copy(script.repo_fpath, script.dist_fpath)
-            else:
-                if stage_flag:
-                    cprint('First stage scripts copied successfully', 'light_green')
+            scripts = [s for s in self.script_list if s.content_fpath.startswith('Requests')]
+            if scripts:
+                cprint('Copying first stage scripts to dist path...', 'yellow')
+                self._materialize_all(scripts)
+                cprint('First stage scripts copied successfully', 'light_green')
         else:  # revert_stage==self.RevertStage.TWO.value
-            for i, script in enumerate(s for s in self.script_list if s.content_fpath.startswith('OBJ')):
-                if i == 0:
-                    cprint('Copying second stage scripts to dist path...', 'yellow')
-                makedirs(path.dirname(script.dist_fpath), exist_ok=True)
-                shutil.copy(script.repo_fpath, script.dist_fpath)
+            scripts = [s for s in self.script_list if s.content_fpath.startswith('OBJ')]
+            if scripts:
+                cprint('Copying second stage scripts to dist path...', 'yellow')
+            self._materialize_all(scripts)
+            cprint('Scripts copied successfully', 'light_green')
+            cprint(fr'Deployment scripts location is {self.repo_properties.dist_path}\{self.dist_folder_name}',
+                   'light_magenta')
+
+    def _materialize_all(self, scripts: list['Script']):
+        # each directory is created once, not once per script
+        self._io_map(lambda dirname: makedirs(dirname, exist_ok=True),
+                     dict.fromkeys(path.dirname(script.dist_fpath) for script in scripts))
+        # cat-file --batch process of a repo object can't be shared between threads, every thread opens its own
+        repos = local()
+        opened = []
+
+        def blob_stream(blob):
+            if not hasattr(repos, 'repo'):
+                repos.repo = git.Repo(self.repo_properties.local_path)
+                opened.append(repos.repo)
+            return repos.repo.odb.stream(blob.binsha)
+
+        try:
+            self._io_map(lambda script: self._materialize(script, blob_stream), scripts)
+        finally:
+            for repo in opened:
+                repo.close()
+
+    def _materialize(self, script, blob_stream):
+        store = self._dist_store
+        if store is not None:
+            if self.__blobs is None:
+                object_fpath = store.put_file(script.repo_fpath)
             else:
-                cprint('Scripts copied successfully', 'light_green')
-                cprint(fr'Deployment scripts location is {self.repo_properties.dist_path}\{self.dist_folder_name}',
-                       'light_magenta')
+                blob = self.__blobs[script.content_fpath]
+                object_fpath = store.put(blob.hexsha, lambda: blob_stream(blob))
+            store.link(object_fpath, script.dist_fpath)
+        elif self.__blobs is None:
+            shutil.copy(script.repo_fpath, script.dist_fpath)
+        else:
+            # blobs are streamed through the object database's persistent cat-file --batch process
+            with open(script.dist_fpath, mode='wb') as f:
+                shutil.copyfileobj(blob_stream(self.__blobs[script.content_fpath]), f)
+
+    @timed('prune_dist_path')
+    def prune_dist_path(self):
+        """Remove run folders out of the retention policy and store objects none of the kept runs use"""
+        store = self._dist_store
+        keep_runs, keep_days = self.repo_properties.dist_keep_runs, self.repo_properties.dist_keep_days
+        if store is None or (keep_runs is None and keep_days is None):
+            return
+        removed = store.prune(self.__log_file, keep_runs, keep_days,
+                              current=path.join(self.repo_properties.dist_path, self.dist_folder_name))
+        if removed:
+            cprint(f'Removed {len(removed)} old run folders from dist path', 'light_green')
 
     def read_sql(self, filepath):
         with open(filepath, mode='rt', encoding=self.__encoding) as f:
@@ -359,42 +850,238 @@ class PostgresObjInstaller:
         return sql
 
     def check_connection(self):
-        cprint(f'Enter the host of the Postgresql cluster, default host is: {self.db_properties.host}',
-               *self.__prompts_default)
-        self.db_properties.host = input()
-        cprint(f'Host is set to {self.db_properties.host}', 'light_green')
-
-        cprint(f'Enter the port of the Postgresql cluster, default port is: {self.db_properties.port}',
-               *self.__prompts_default)
-        self.db_properties.port = input()
-        cprint(f'Port is set to {self.db_properties.port}', 'light_green')
-
-        cprint(f'Enter the database name, default database is: {self.db_properties.dbname}',
-               *self.__prompts_default)
-        self.db_properties.dbname = input()
-        cprint(f'Database name is set to {self.db_properties.dbname}', 'light_green')
+        self.ask_credentials()
+        return self._connect(self.db_properties)
+
+    def ask_credentials(self):
+        """Ask the connection properties once for all targets"""
+        if self.__credentials_asked:
+            return
+        if len(self.db_targets) == 1:
+            cprint(f'Enter the host of the Postgresql cluster, default host is: {self.db_properties.host}',
+                   *self.__prompts_default)
+            self.db_properties.host = self._ask()
+            cprint(f'Host is set to {self.db_properties.host}', 'light_green')
+
+            cprint(f'Enter the port of the Postgresql cluster, default port is: {self.db_properties.port}',
+                   *self.__prompts_default)
+            self.db_properties.port = self._ask()
+            cprint(f'Port is set to {self.db_properties.port}', 'light_green')
+
+            cprint(f'Enter the database name, default database is: {self.db_properties.dbname}',
+                   *self.__prompts_default)
+            self.db_properties.dbname = self._ask()
+            cprint(f'Database name is set to {self.db_properties.dbname}', 'light_green')
+        else:
+            cprint('Deploy targets:\n' + '\n'.join(target.label for target in self.db_targets), 'light_magenta')
 
         cprint(f'Enter the user name for db connection, default user is: {self.db_properties.user}',
                *self.__prompts_default)
-        self.db_properties.user = input()
+        user = self._ask()
+        for target in self.db_targets:
+            target.user = user
         cprint(f'User is set to {self.db_properties.user}', 'light_green')
 
-        self.db_properties.password = askpass(prompt=colored(f'Enter the password for db connection\n', 'blue'))
-        connection = connect(**self.db_properties.as_dict())
-        connection.set_session(autocommit=True)
+        password = self._ask_password()
+        for target in self.db_targets:
+            target.password = password
+        self.__credentials_asked = True
 
+    @timed('connect')
+    def _connect(self, target):
+        connection = psycopg2.connect(**target.as_dict())
+        connection.set_session(autocommit=True)
+        # single statement payload is sent as raw bytes of the scripts
+        connection.set_client_encoding(self.__encoding.replace('-', ''))
         return connection
 
-    def execute_script(self, sql_query, connection, *args):
+    def use_connections(self, connections: dict):
+        """Deploy through already opened connections keyed by target label instead of connecting on demand"""
+        self.connection = connections[self.db_properties.label]
+        self.__target_connections.update(connections)
+        self.__credentials_asked = True
+
+    def _connection(self):
+        if self.connection is None:
+            self.connection = self.check_connection()
+        return self.connection
+
+    def _target_connection(self, target):
+        """Connection of the target, the first one asks for the credentials of all targets"""
+        if target is self.db_properties:
+            return self._connection()
+        self.ask_credentials()
+        if target.label not in self.__target_connections:
+            self.__target_connections[target.label] = self._connect(target)
+        return self.__target_connections[target.label]
+
+    def _last_deployed_commit(self, connection, folder=None):
+        """Commit of the latest successful release, of the given Requests folder only if it is set"""
+        try:
+            self._ensure_history_indexes(connection)
+            if folder is None:
+                last_hash = self.execute_script(self._last_hash_query, connection, self.DeployType.RELEASE.value)
+            else:
+                last_hash = self.execute_script(self._last_folder_hash_query, connection,
+                                                self.DeployType.RELEASE.value, folder)
+        except errors.UndefinedTable:
+            return None
+        return last_hash[0].split()[-1] if last_hash else None
+
+    def execute_script(self, sql_query, connection, *args, script_path=None):
         with connection.cursor() as cur:
             if args:
                 cur.execute(sql_query, args)
                 res = cur.fetchone()
                 return res
+            elif script_path is not None:
+                with self.timings.script(script_path, self._target_label, connection) as info:
+                    cur.execute(sql_query)
+                    info['rowcount'] = cur.rowcount
+                self.log_and_print('Success', 'magenta')
             else:
                 cur.execute(sql_query)
                 self.log_and_print('Success', 'magenta')
 
+    def apply_session_settings(self, connection):
+        """Set lock_timeout/statement_timeout for the session, once per connection"""
+        settings = {'lock_timeout': self.lock_timeout, 'statement_timeout': self.statement_timeout}
+        settings = {name: str(value) for name, value in settings.items() if value is not None}
+        key = (self._target_label, connection.get_backend_pid())
+        if not settings or key in self.__session_settings:
+            return
+        with connection.cursor() as cur:
+            for name, value in settings.items():
+                cur.execute('SELECT set_config(%s, %s, false)', (name, value))
+        self.__session_settings.add(key)
+
+    def _monitor_connection(self, label):
+        """Separate connection to look up blocking sessions with, None if it can't be opened"""
+        if label not in self.__monitor_connections:
+            target = next(t for t in self.db_targets if label is None or t.label == label)
+            try:
+                connection = self._connect(target)
+                with connection.cursor() as cur:
+                    cur.execute("SET application_name = 'pgObjectsInstaller lock monitor'")
+            except psycopg2.Error:
+                connection = None
+            self.__monitor_connections[label] = connection
+        return self.__monitor_connections[label]
+
+    def _blockers(self, label, pid):
+        """Locks the backend pid waits for and the sessions holding them"""
+        with self.__monitor_lock:
+            connection = self._monitor_connection(label)
+            if connection is None:
+                return []
+            with connection.cursor() as cur:
+                cur.execute('''SELECT coalesce(w.relation::regclass::text, w.locktype), w.mode, a.pid, a.usename,
+                                      a.state, date_trunc('second', now() - a.xact_start)::text, left(a.query, 200)
+                               FROM pg_locks w
+                               CROSS JOIN LATERAL unnest(pg_blocking_pids(w.pid)) AS b(pid)
+                               JOIN pg_stat_activity a ON a.pid = b.pid
+                               WHERE w.pid = %s AND NOT w.granted''', (pid,))
+                return cur.fetchall()
+
+    def close_monitor_connections(self):
+        with self.__monitor_lock:
+            for connection in self.__monitor_connections.values():
+                if connection is not None:
+                    connection.close()
+            self.__monitor_connections.clear()
+
+    def execute_lock_aware(self, connection, script_name, execute, rollback=None):
+        """Run execute(), retrying it with exponential backoff while it fails to get a lock within lock_timeout
+        or is chosen as a deadlock victim, until lock_retry_deadline seconds pass. The sessions blocking it
+        are reported on every failure. rollback() restores the connection before the next attempt"""
+        if self.lock_timeout is None:
+            return execute()
+
+        label = self._target_label
+        deadline = monotonic() + self.lock_retry_deadline
+        delay = self.lock_retry_delay
+        interval = max(self._timeout_seconds(self.lock_timeout) / 2, 0.1)
+        attempt = 0
+        while True:
+            attempt += 1
+            watch = BlockerWatch(partial(self._blockers, label, connection.get_backend_pid()), interval)
+            try:
+                with watch:
+                    return execute()
+            except (errors.LockNotAvailable, errors.DeadlockDetected) as e:
+                if rollback is not None:
+                    rollback()
+                self.log_and_print(f'{script_name}: {str(e).strip()} (attempt {attempt})', 'yellow')
+                for relation, mode, pid, user, state, xact_age, query in watch.blockers:
+                    self.log_and_print(f'Waited for {mode} on {relation}, blocked by pid {pid}({user}, {state}, '
+                                       f'transaction age {xact_age}): {query}', 'yellow')
+                if monotonic() + delay > deadline:
+                    self.log_and_print(f'{script_name}: no lock after {attempt} attempts, giving up', 'red')
+                    raise
+                self.log_and_print(f'Retrying {script_name} in {delay}s...', 'yellow')
+                sleep(delay)
+                delay = min(delay * 2, self.__lock_retry_max_delay)
+
+    @staticmethod
+    def _timeout_seconds(value):
+        """Seconds of a Postgresql duration setting, an int or a string like '5s', '200ms' or '1min'"""
+        if isinstance(value, (int, float)):
+            return value / 1000
+        number = value.strip().rstrip('abcdefghijklmnopqrstuvwxyz').strip()
+        unit = value.strip()[len(number):].strip() or 'ms'
+        return float(number) * {'us': 1e-6, 'ms': 1e-3, 's': 1, 'min': 60, 'h': 3600, 'd': 86400}[unit]
+
+    def run_script(self, script, connection):
+        """Execute a script of the script list, data files are loaded into their tables with COPY"""
+        if self._is_data_file(script):
+            self.copy_data(script, connection)
+        else:
+            self.execute_script(self.read_sql(script.dist_fpath), connection, script_path=script.content_fpath)
+
+    def copy_data(self, script, connection):
+        """Load a data file in its own transaction, so a truncated table isn't left empty by a failed load"""
+        with connection.cursor() as cur:
+            if connection.autocommit:
+                cur.execute('BEGIN')
+            try:
+                with self.timings.script(script.content_fpath, self._target_label, connection) as info:
+                    info['rowcount'] = self._copy(cur, script)
+                if connection.autocommit:
+                    cur.execute('COMMIT')
+            except Exception:
+                if connection.autocommit:
+                    cur.execute('ROLLBACK')
+                raise
+        self.log_and_print(self._success_message(script, info['rowcount']), 'magenta')
+
+    def _copy_query(self, spec):
+        options = [sql.SQL('FORMAT csv'),
+                   sql.SQL('HEADER true' if spec.header else 'HEADER false'),
+                   sql.SQL('DELIMITER {}').format(sql.Literal(spec.delimiter))]
+        if spec.null is not None:
+            options.append(sql.SQL('NULL {}').format(sql.Literal(spec.null)))
+        columns = sql.SQL('')
+        if spec.columns:
+            columns = sql.SQL(' ({})').format(sql.SQL(', ').join(map(sql.Identifier, spec.columns)))
+        return sql.SQL('COPY {table}{columns} FROM STDIN WITH ({options})').format(
+            table=sql.Identifier(*spec.table.split('.')),
+            columns=columns,
+            options=sql.SQL(', ').join(options))
+
+    def _copy(self, cur, script):
+        """Stream a data file into its table chunk by chunk, returns the number of loaded rows"""
+        spec = self.__copy_specs[script.content_fpath]
+        if spec.truncate:
+            cur.execute(sql.SQL('TRUNCATE {}').format(sql.Identifier(*spec.table.split('.'))))
+        with open(script.dist_fpath, mode='rb') as f:
+            cur.copy_expert(self._copy_query(spec), f, size=self.__copy_chunk_size)
+        return cur.rowcount
+
+    def _success_message(self, script, rowcount):
+        if script.content_fpath in self.__copy_specs:
+            return f'Success, {rowcount} rows loaded into {self.__copy_specs[script.content_fpath].table}'
+        return 'Success'
+
     def get_branch(self):
         try:
             return f'{self.repo.active_branch} {self.repo.head.commit}'
@@ -403,17 +1090,21 @@ class PostgresObjInstaller:
 
     @property
     def _commit(self):
-        return f'{self.repo.head.commit}'
+        if self.__revert_commit is not None:
+            return f'{self.__revert_commit}'
+        return f'{self.__release_commit}'
 
     @property
     def _last_hash_query(self):
         schema, table = self.log_table.split('.')
 
+        # index-only scan of the first entry of _history_indexes_ddl
         query = sql.SQL('''SELECT {field}
                         FROM {schema}.{table}
-                        WHERE created=(select max(created) FROM {schema}.{table} )
-                        AND deploy_type = %s 
-                        AND is_successful'''
+                        WHERE deploy_type = %s
+                        AND is_successful
+                        ORDER BY created DESC
+                        LIMIT 1'''
                         ).format(
             field=sql.Identifier('branch'),
             schema=sql.Identifier(schema),
@@ -421,17 +1112,360 @@ class PostgresObjInstaller:
         )
         return query
 
-    def get_log_dml(self, is_successful):
+    @property
+    def _last_folder_hash_query(self):
+        schema, table = self.log_table.split('.')
+
+        query = sql.SQL('''SELECT {field}
+                        FROM {schema}.{table}
+                        WHERE deploy_type = %s
+                        AND requests_folder = %s
+                        AND is_successful
+                        ORDER BY created DESC
+                        LIMIT 1'''
+                        ).format(
+            field=sql.Identifier('branch'),
+            schema=sql.Identifier(schema),
+            table=sql.Identifier(table)
+        )
+        return query
+
+    @property
+    def _history_indexes_ddl(self):
+        """(index name, ddl) of the indexes serving the lookups of the latest successful deploy"""
+        schema, table = self.log_table.split('.')
+
+        ddl = {f'{table}_last_deploy_idx': '(deploy_type, created DESC, branch)',
+               f'{table}_last_folder_deploy_idx': '(deploy_type, requests_folder, created DESC, branch)'}
+        return [(regclass_text((schema, index)),
+                 sql.SQL('CREATE INDEX CONCURRENTLY IF NOT EXISTS {index} ON {schema}.{table} ' + columns +
+                         ' WHERE is_successful').format(index=sql.Identifier(index),
+                                                        schema=sql.Identifier(schema),
+                                                        table=sql.Identifier(table)))
+                for index, columns in ddl.items()]
+
+    def _ensure_history_indexes(self, connection):
+        """Create missing lookup indexes of log_table once per target, a missing one only makes the lookup slower.
+        They are built concurrently, so deploys writing to log_table meanwhile aren't blocked"""
+        if self._target_label in self.__history_indexed:
+            return
+        self.__history_indexed.add(self._target_label)
+        indexes = dict(self._history_indexes_ddl)
+        with connection.cursor() as cur:
+            # CREATE INDEX takes its lock on the table even when the index exists; an invalid index is left by
+            # an interrupted concurrent build and is built again
+            cur.execute('''SELECT i.name, x.indexrelid IS NOT NULL
+                           FROM unnest(%s::text[]) AS i(name)
+                           LEFT JOIN pg_index x ON x.indexrelid = to_regclass(i.name)
+                           WHERE x.indexrelid IS NULL OR NOT x.indisvalid''', (list(indexes),))
+            for index, is_invalid in cur.fetchall():
+                try:
+                    if is_invalid:
+                        cur.execute(sql.SQL('DROP INDEX CONCURRENTLY IF EXISTS {}').format(sql.SQL(index)))
+                    cur.execute(indexes[index])
+                    self.log_and_print(f'Created index {index} on {self.log_table}', 'cyan')
+                except errors.UndefinedTable:
+                    raise
+                except psycopg2.Error as e:
+                    self.log_and_print(f'Index of {self.log_table} can\'t be created, the lookup of the last '
+                                       f'deploy scans the table: {e}', 'yellow')
+                    return
+
+    @property
+    def _ledger_ddl(self):
+        schema, table = self.ledger_table.split('.')
+
+        query = sql.SQL('''CREATE TABLE IF NOT EXISTS {schema}.{table}
+                        (
+                            id           bigserial PRIMARY KEY,
+                            created      timestamp NOT NULL DEFAULT now(),
+                            script_path  text      NOT NULL,
+                            content_hash text      NOT NULL,
+                            commit_hash  text,
+                            is_successful boolean  NOT NULL,
+                            run_id       uuid,
+                            requests_folder text,
+                            duration_ms  integer,
+                            error        text
+                        );
+                        ALTER TABLE {schema}.{table} ADD COLUMN IF NOT EXISTS run_id uuid,
+                                                     ADD COLUMN IF NOT EXISTS requests_folder text,
+                                                     ADD COLUMN IF NOT EXISTS duration_ms integer,
+                                                     ADD COLUMN IF NOT EXISTS error text;
+                        CREATE INDEX IF NOT EXISTS {path_index} ON {schema}.{table} (script_path, created, content_hash)
+                                                                WHERE is_successful;
+                        CREATE INDEX IF NOT EXISTS {run_index} ON {schema}.{table} (requests_folder, commit_hash, created)'''
+                        ).format(
+            schema=sql.Identifier(schema),
+            table=sql.Identifier(table),
+            path_index=sql.Identifier(f'{table}_path_idx'),
+            run_index=sql.Identifier(f'{table}_run_idx')
+        )
+        if self.ledger_retention_days is not None:
+            query += sql.SQL('''
+                        ;CREATE INDEX IF NOT EXISTS {created_index} ON {schema}.{table} (created)''').format(
+                schema=sql.Identifier(schema),
+                table=sql.Identifier(table),
+                created_index=sql.Identifier(f'{table}_created_idx')
+            )
+        return query
+
+    @property
+    def _ledger_catalog_check(self):
+        """Query listing the relations and columns of the ledger missing in the database, and its parameters"""
+        schema, table = self.ledger_table.split('.')
+        indexes = ['path_idx', 'run_idx'] + (['created_idx'] if self.ledger_retention_days is not None else [])
+        relations = [regclass_text((schema, name)) for name in [table] + [f'{table}_{index}' for index in indexes]]
+
+        query = '''SELECT r.name
+                   FROM unnest(%s::text[]) AS r(name)
+                   WHERE to_regclass(r.name) IS NULL
+                   UNION ALL
+                   SELECT c.name
+                   FROM unnest(%s::text[]) AS c(name)
+                   WHERE NOT EXISTS (SELECT 1
+                                     FROM pg_attribute a
+                                     WHERE a.attrelid = to_regclass(%s)
+                                     AND a.attname = c.name
+                                     AND NOT a.attisdropped)'''
+        return query, (relations, ['run_id', 'requests_folder', 'duration_ms', 'error'], relations[0])
+
+    @property
+    def _ledger_retention_query(self):
+        schema, table = self.ledger_table.split('.')
+
+        # the latest success of every script is kept whatever its age, it is what makes unchanged scripts skipped
+        query = sql.SQL('''DELETE FROM {schema}.{table} l
+                        WHERE l.created < now() - make_interval(days => %s)
+                        AND (NOT l.is_successful
+                             OR EXISTS (SELECT 1
+                                        FROM {schema}.{table} n
+                                        WHERE n.script_path = l.script_path
+                                        AND n.is_successful
+                                        AND n.created > l.created))'''
+                        ).format(
+            schema=sql.Identifier(schema),
+            table=sql.Identifier(table)
+        )
+        return query
+
+    @property
+    def _applied_scripts_query(self):
+        schema, table = self.ledger_table.split('.')
+
+        # the latest success of a script only, a script rolled back to an older content has to run again
+        query = sql.SQL('''SELECT DISTINCT ON (script_path) script_path, content_hash
+                        FROM {schema}.{table}
+                        WHERE script_path = ANY(%s)
+                        AND is_successful
+                        ORDER BY script_path, created DESC, id DESC'''
+                        ).format(
+            schema=sql.Identifier(schema),
+            table=sql.Identifier(table)
+        )
+        return query
+
+    def _ledger_insert(self, duration):
+        schema, table = self.ledger_table.split('.')
+
+        query = sql.SQL('''INSERT INTO {schema}.{table}(script_path, content_hash, commit_hash, is_successful,
+                                                        run_id, requests_folder, duration_ms, error)
+                        SELECT r.script_path, r.content_hash, r.commit_hash, r.is_successful, r.run_id,
+                               r.requests_folder, {duration}, r.error
+                        FROM unnest(%s::text[], %s::text[], %s::text[], %s::boolean[], %s::uuid[],
+                                    %s::text[], %s::float8[], %s::text[])
+                             AS r(script_path, content_hash, commit_hash, is_successful, run_id,
+                                  requests_folder, duration, error)'''
+                        ).format(
+            schema=sql.Identifier(schema),
+            table=sql.Identifier(table),
+            duration=duration
+        )
+        return query
+
+    @property
+    def _ledger_dml(self):
+        return self._ledger_insert(sql.SQL('r.duration::integer'))
+
+    @property
+    def _batch_ledger_dml(self):
+        # a batch is one query message, so its scripts have run since the server received it; the duration
+        # column of the rows takes the share of every script in the batch
+        return self._ledger_insert(sql.SQL('round(extract(epoch FROM clock_timestamp() - statement_timestamp()) '
+                                           '* 1000 * r.duration)::integer'))
+
+    @property
+    def _checkpoints_query(self):
+        schema, table = self.ledger_table.split('.')
+
+        query = sql.SQL('''SELECT script_path, is_successful
+                        FROM {schema}.{table}
+                        WHERE requests_folder = %s
+                        AND commit_hash = %s
+                        ORDER BY created'''
+                        ).format(
+            schema=sql.Identifier(schema),
+            table=sql.Identifier(table)
+        )
+        return query
+
+    def _script_hash(self, script):
+        if script.content_fpath not in self.__script_hashes:
+            digest = sha256()
+            with open(script.dist_fpath, mode='rb') as f:
+                for chunk in iter(lambda: f.read(self.__copy_chunk_size), b''):
+                    digest.update(chunk)
+            if script.content_fpath in self.__copy_specs:
+                # a data file is loaded again when its target table or options change
+                digest.update(self.__copy_specs[script.content_fpath].raw)
+            self.__script_hashes[script.content_fpath] = digest.hexdigest()
+        return self.__script_hashes[script.content_fpath]
+
+    @property
+    def _uses_ledger(self):
+        """The ledger is configured and available in the database of the current target"""
+        return self.ledger_table is not None and self._target_label not in self.__ledger_unavailable
+
+    def _ensure_ledger(self, connection):
+        try:
+            with connection.cursor() as cur:
+                # ALTER TABLE and CREATE INDEX lock the ledger even when there is nothing to change
+                cur.execute(*self._ledger_catalog_check)
+                missing = [name for name, in cur.fetchall()]
+                if missing:
+                    self.log_and_print(f'Creating missing parts of {self.ledger_table}: {", ".join(missing)}', 'cyan')
+                    cur.execute(self._ledger_ddl)
+            self.__ledger_unavailable.discard(self._target_label)
+        except psycopg2.Error as e:
+            self.log_and_print(f'Script ledger {self.ledger_table} is unavailable, '
+                               f'all scripts will be executed: {e}', 'yellow')
+            # other targets keep their ledgers
+            self.__ledger_unavailable.add(self._target_label)
+
+    def filter_applied_scripts(self, connection, script_list: list['Script']):
+        """Drop scripts whose content is the one last applied successfully to the database"""
+        if self.force or not self._uses_ledger:
+            return script_list
+
+        with connection.cursor() as cur:
+            cur.execute(self._applied_scripts_query, ([s.content_fpath for s in script_list],))
+            applied = dict(cur.fetchall())
+
+        pending = []
+        for script in script_list:
+            if applied.get(script.content_fpath) == self._script_hash(script):
+                self.log_and_print(f'Script is unchanged since last deploy, skipped: {script.content_fpath}', 'cyan')
+            else:
+                pending.append(script)
+        self.log_and_print(f'Scripts to execute: {len(pending)} of {len(script_list)}', 'light_green')
+        return pending
+
+    def resume_point(self, connection, script_list: list['Script']):
+        """Drop scripts having a committed successful row in the ledger for the same folder and commit.
+
+        Only committed results are skipped: scripts of a rolled back transaction and scripts a parallel deploy
+        never started are executed again whatever their position relative to the failed script.
+        """
+        if not self.resume or not self._uses_ledger:
+            return script_list
+
+        with connection.cursor() as cur:
+            cur.execute(self._checkpoints_query, (self.repo_properties.folder, self._commit))
+            rows = cur.fetchall()
+
+        if not rows:
+            self.log_and_print('No checkpoint found for this folder and commit, deploy starts from the beginning',
+                               'yellow')
+            return script_list
+
+        succeeded = {script_path for script_path, is_successful in rows if is_successful}
+        pending = [s for s in script_list if s.content_fpath not in succeeded]
+        self.log_and_print(f'Resuming: {len(script_list) - len(pending)} of {len(script_list)} scripts are '
+                           f'already applied, {pending[0].content_fpath if pending else "nothing left to execute"}'
+                           f'{" is the first to execute" if pending else ""}', 'cyan')
+        return pending
+
+    def _duration_ms(self, script):
+        duration = self.timings.duration(script.content_fpath, self._target_label)
+        return None if duration is None else round(duration * 1000)
+
+    def _ledger_row(self, script, is_successful, error):
+        return (script.content_fpath, self._script_hash(script), self._commit, is_successful, self.run_id,
+                self.repo_properties.folder, self._duration_ms(script), error)
+
+    def _ledger_params(self, script_list: list['Script'], is_successful, error=None):
+        """Columns of the ledger rows of the scripts as arrays of _ledger_dml, one statement writes any number
+        of rows"""
+        rows = [self._ledger_row(s, is_successful, error) for s in script_list]
+        return [list(column) for column in zip(*rows)]
+
+    def write_ledger(self, connection, script_list: list['Script'], is_successful, error=None):
+        """Write ledger rows of the scripts right after them, in the transaction they are committed with if any,
+        so a deploy interrupted at any point resumes after its last executed script"""
+        if not self._uses_ledger or not script_list:
+            return
+        try:
+            with connection.cursor() as cur:
+                cur.execute(self._ledger_dml, self._ledger_params(script_list, is_successful, error))
+        except psycopg2.Error as e:
+            if not connection.autocommit:
+                raise
+            self.log_and_print(f'Results of {len(script_list)} scripts can\'t be written to {self.ledger_table}: '
+                               f'{e}', 'red')
+
+    def apply_ledger_retention(self, connection):
+        """Remove ledger rows out of the retention policy at the end of the deploy"""
+        if not self._uses_ledger or self.ledger_retention_days is None:
+            return
+        try:
+            with connection.cursor() as cur:
+                cur.execute(self._ledger_retention_query, (self.ledger_retention_days,))
+                if cur.rowcount:
+                    self.log_and_print(f'Removed {cur.rowcount} expired rows from {self.ledger_table}', 'cyan')
+        except psycopg2.Error as e:
+            self.log_and_print(f'Expired rows of {self.ledger_table} can\'t be removed: {e}', 'red')
+
+    def report_timings(self):
+        """Write timings.json into the dist folder and print the slowest scripts"""
+        if self.dist_folder_name is None:
+            return
+        fpath = path.abspath(f'{self.repo_properties.dist_path}/{self.dist_folder_name}/{self.__timings_file}')
+        self.timings.dump(fpath, self.__encoding)
+
+        for phase in self.timings.phases:
+            cprint(f'{phase.name:<28}{phase.duration:10.3f}s', 'light_magenta')
+        slowest = self.timings.slowest_scripts(self.timings_top)
+        if slowest:
+            cprint(f'Top {len(slowest)} slowest scripts:', 'light_magenta', attrs=['bold'])
+        for timing in slowest:
+            target = '' if timing.target is None else f'[{timing.target}] '
+            cprint(f'{timing.duration:10.3f}s  {target}{timing.script_path}', 'light_magenta')
+
+    @property
+    def _log_dml(self):
+        schema, table = self.log_table.split('.')
+
+        query = sql.SQL('''INSERT INTO {schema}.{table}(branch, deploy_mode, is_successful, deploy_type,
+                                                        requests_folder)
+                        VALUES (%s, %s, %s, %s, %s)'''
+                        ).format(
+            schema=sql.Identifier(schema),
+            table=sql.Identifier(table)
+        )
+        return query
+
+    def write_log(self, connection, is_successful):
 
         if self.deploy_type == self.DeployType.RELEASE.value:
-            branch = repr(self.__release_branch)
+            branch = self.__release_branch
 
         else:  # self.deploy_type==self.DeployType.REVERT.value:
-            branch = repr(f'{self.__release_branch} to {self.__revert_branch}')
+            branch = f'{self.__release_branch} to {self.__revert_branch}'
 
-        return f'insert into {self.log_table}(branch, deploy_mode, is_successful, deploy_type, requests_folder) ' \
-               f'values({branch}, {repr(self.deploy_mode)}, {is_successful}' \
-               f', {repr(self.deploy_type)}, {repr(self.repo_properties.folder)})'
+        with connection.cursor() as cur:
+            cur.execute(self._log_dml, (branch, self.deploy_mode, is_successful, self.deploy_type,
+                                        self.repo_properties.folder))
+        self.log_and_print('Success', 'magenta')
 
     @property
     def dist_folder_name(self):
@@ -443,99 +1477,825 @@ class PostgresObjInstaller:
         if self.__dist_folder_name is None:
             self.__dist_folder_name = value
 
-    def create_single_inst_file(self) -> str | None:
+    @staticmethod
+    @cache
+    def _single_statement_template(relative_path) -> bytes:
+        with open(resource_path(relative_path), mode='rb') as f:
+            return f.read()
+
+    @timed('build_single_statement')
+    def create_single_inst_file(self, script_list: list['Script'], part=None) -> tuple[str, bytes] | None:
+        """Build the single statement in one pass, returns the path of the written file and the payload to execute"""
         if self.deploy_mode == self.DeployMode.SINGLE_STATEMENT.value:
+            filename = self.__single_transaction_filename
+            if part is not None:
+                name, ext = path.splitext(filename)
+                filename = f'{name} part {part}{ext}'
+            if self._target_label is not None:
+                # every target of a fan-out deploy gets its own file, their script lists may differ
+                name, ext = path.splitext(filename)
+                filename = f'{name} {self._target_label.replace(":", "_").replace("/", "_")}{ext}'
             fpath = path.abspath(f'{self.repo_properties.dist_path}'
                                  f'/{self.dist_folder_name}'
-                                 f'/{self.__single_transaction_filename}')
+                                 f'/{filename}')
+
+            # scripts are copied as the utf-8 bytes they are stored as into one buffer, whose value is taken
+            # without a copy, so the payload is held in memory once and no decoded copy of it exists
+            buffer = io.BytesIO()
+            buffer.write(self._single_statement_template(self.__single_statement_start))
+            for script in script_list:
+                with open(script.dist_fpath, mode='rb') as f:
+                    shutil.copyfileobj(f, buffer, self.__copy_chunk_size)
+                buffer.write(self.__single_statement_separator)
+            buffer.write(self._single_statement_template(self.__single_statement_end))
+            payload = buffer.getvalue()
+            del buffer
+
+            with open(fpath, mode='wb') as f:
+                f.write(payload)
+
+            self.log_and_print(f'Single statement of {len(script_list)} scripts is built, '
+                               f'payload size is {len(payload) / 1024:.1f} KiB', 'light_green')
+            return fpath, payload
+
+    def _execute_pooled(self, pool, script, label):
+        self._target_label = label
+        connection = pool.getconn()
+        try:
+            connection.autocommit = True
+            self.apply_session_settings(connection)
+            self.log_and_print(f'Executing script: {script.content_fpath}', 'yellow')
+            self.execute_lock_aware(connection, script.content_fpath, partial(self.run_script, script, connection))
+            self.write_ledger(connection, [script], True)
+        finally:
+            pool.putconn(connection)
+
+    def execute_parallel(self, script_list: list['Script'], target):
+        """Run independent scripts concurrently, returns the first failed script and its error or None"""
+        # data files are barriers wherever they are located, so their content isn't needed
+        graph = build_dependency_graph([(s.content_fpath, '' if self._is_data_file(s) else self.read_sql(s.dist_fpath))
+                                        for s in script_list], self._data_file_indices(script_list))
+        cprint(f'Executing scripts on up to {self.parallel_workers} connections...', 'yellow')
+
+        pool = pg_pool.ThreadedConnectionPool(1, self.parallel_workers, **target.as_dict())
+        done, running, failure = set(), {}, None
+        try:
+            with ThreadPoolExecutor(max_workers=self.parallel_workers) as executor:
+                while True:
+                    if failure is None:
+                        for i in [i for i, deps in graph.items() if deps <= done]:
+                            running[executor.submit(self._execute_pooled, pool, script_list[i],
+                                                    self._target_label)] = i
+                            del graph[i]
+                    if not running:
+                        break
+
+                    finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        i = running.pop(future)
+                        if future.exception() is None:
+                            done.add(i)
+                        elif failure is None:
+                            failure = script_list[i], future.exception()
+        finally:
+            pool.closeall()
+        return failure
+
+    def _script_batches(self, script_list: list['Script']):
+        """Runs of consecutive small scripts fitting into script_batch_size scripts and script_batch_bytes bytes,
+        as lists of (script, sql text). Any other script is a batch of its own with None text"""
+        if self.script_batch_size <= 1:
+            yield from ([(script, None)] for script in script_list)
+            return
+
+        def candidate(script):
+            if self._is_data_file(script) or path.getsize(script.dist_fpath) > self.script_batch_bytes:
+                return None
+            sql_text = self.read_sql(script.dist_fpath)
+            return sql_text if is_batchable(sql_text) else None
+
+        batch, size = [], 0
+        for script, sql_text in zip(script_list, self._io_map(candidate, script_list)):
+            length = 0 if sql_text is None else len(sql_text.encode(self.__encoding))
+            if batch and (sql_text is None or len(batch) == self.script_batch_size
+                          or size + length > self.script_batch_bytes):
+                yield batch
+                batch, size = [], 0
+            if sql_text is None:
+                yield [(script, None)]
+            else:
+                batch.append((script, sql_text))
+                size += length
+        if batch:
+            yield batch
+
+    def _execute_batch(self, connection, batch):
+        """Send the scripts of a batch as one query, in the implicit transaction of which a failure undoes
+        the whole batch and their ledger rows are committed. Returns False if it failed"""
+        # scripts of a batch can't be timed one by one, each gets the share of its size in the batch duration
+        total = sum(len(sql_text) for _, sql_text in batch)
+        shares = [len(sql_text) / total if total else 1 / len(batch) for _, sql_text in batch]
+        self.log_and_print(f'Executing {len(batch)} scripts in one batch: '
+                           f'{", ".join(script.content_fpath for script, _ in batch)}', 'yellow')
+        try:
+            with connection.cursor() as cur:
+                query, params = batch_payload([sql_text for _, sql_text in batch]), None
+                if self._uses_ledger:
+                    # query parameters make % of the scripts a placeholder character
+                    query = sql.SQL(query.replace('%', '%%') + '\n;\n') + self._batch_ledger_dml
+                    params = self._ledger_params([script for script, _ in batch], True)
+                    params[6] = shares
+                with self.timings.batch([script.content_fpath for script, _ in batch], shares,
+                                        self._target_label, connection):
+                    cur.execute(query, params)
+        except psycopg2.Error as e:
+            self.log_and_print(f'Batch failed, its scripts are executed one by one: {str(e).strip()}', 'yellow')
+            return False
+        self.log_and_print('Success', 'magenta')
+        return True
+
+    def execute_separate(self, connection, script_list: list['Script']):
+        """Run scripts one by one, small ones in batches of one round trip if script_batch_size is set.
+        Returns the first failed script and its error or None"""
+        for batch in self._script_batches(script_list):
+            if len(batch) > 1 and self._execute_batch(connection, batch):
+                continue
+            for script, _ in batch:
+                try:
+                    self.log_and_print(f'Executing script: {script.content_fpath}', 'yellow')
+                    self.execute_lock_aware(connection, script.content_fpath,
+                                            partial(self.run_script, script, connection))
+                except Exception as e:
+                    return script, e
+                self.write_ledger(connection, [script], True)
+        return None
+
+    def execute_transactional(self, connection, script_list: list['Script']):
+        """Run scripts in transactions of transaction_batch_size scripts(all of them if 0) with a savepoint per script.
+
+        Every failed script of a batch is reported, then the whole batch is rolled back. A script failing to get
+        a lock rolls back the whole transaction, so the locks of the scripts before it are released while the
+        batch waits to be retried.
+        Returns the first failed script and its error or None.
+        """
+        batch_size = self.transaction_batch_size or len(script_list) or 1
+        connection.autocommit = False
+        try:
+            for start in range(0, len(script_list), batch_size):
+                batch = script_list[start:start + batch_size]
+                locked = []
+                try:
+                    failures = self.execute_lock_aware(
+                        connection, f'transaction of scripts {start + 1}-{start + len(batch)}',
+                        partial(self._execute_in_transaction, connection, batch, locked), rollback=connection.rollback)
+                except (errors.LockNotAvailable, errors.DeadlockDetected) as e:
+                    connection.rollback()
+                    self.log_and_print(f'Transaction of {len(batch)} scripts is rolled back', 'red')
+                    return locked[-1], e
+
+                if failures:
+                    connection.rollback()
+                    self.log_and_print(f'Got {len(failures)} errors, transaction of {len(batch)} scripts '
+                                       f'is rolled back', 'red')
+                    return failures[0]
+
+                # successful scripts are checkpointed in the same transaction they are committed with
+                self.write_ledger(connection, batch, True)
+                connection.commit()
+                self.log_and_print(f'Committed {start + len(batch)} of {len(script_list)} scripts', 'light_green')
+        except Exception:
+            connection.rollback()
+            raise
+        finally:
+            connection.autocommit = True
+        return None
+
+    def _execute_in_transaction(self, connection, batch: list['Script'], locked: list):
+        """Run the scripts of a batch with a savepoint per script, returns the failed scripts and their errors.
+        With lock_timeout set a lock failure is raised for the whole transaction to be retried, and the script
+        is appended to locked"""
+        failures = []
+        with connection.cursor() as cur:
+            for script in batch:
+                self.log_and_print(f'Executing script: {script.content_fpath}', 'yellow')
+                cur.execute('SAVEPOINT poi_script')
+                try:
+                    with self.timings.script(script.content_fpath, self._target_label, connection) as info:
+                        info['rowcount'] = self._execute_with_cursor(cur, script)
+                except (errors.LockNotAvailable, errors.DeadlockDetected) as e:
+                    if self.lock_timeout is None:
+                        cur.execute('ROLLBACK TO SAVEPOINT poi_script')
+                        failures.append((script, e))
+                        self.log_and_print(f'{script.content_fpath}: {e}', 'red')
+                        continue
+                    locked.append(script)
+                    raise
+                except psycopg2.Error as e:
+                    cur.execute('ROLLBACK TO SAVEPOINT poi_script')
+                    failures.append((script, e))
+                    self.log_and_print(f'{script.content_fpath}: {e}', 'red')
+                else:
+                    cur.execute('RELEASE SAVEPOINT poi_script')
+                    self.log_and_print(self._success_message(script, info['rowcount']), 'magenta')
+        return failures
+
+    def _execute_with_cursor(self, cur, script):
+        if self._is_data_file(script):
+            return self._copy(cur, script)
+        cur.execute(self.read_sql(script.dist_fpath))
+        return cur.rowcount
+
+    def execute_single_with_data(self, connection, script_list: list['Script']):
+        """Single mode for script lists with data files, COPY can't run inside a DO block.
+
+        Runs of scripts between data files become single statements of their own, data files are loaded
+        between them, and everything is committed in one transaction.
+        """
+        connection.autocommit = False
+        try:
+            part = 0
+            for is_data, group in groupby(script_list, key=self._is_data_file):
+                if is_data:
+                    with connection.cursor() as cur:
+                        for script in group:
+                            self.log_and_print(f'Loading data file: {script.content_fpath}', 'yellow')
+                            with self.timings.script(script.content_fpath, self._target_label, connection) as info:
+                                info['rowcount'] = self._copy(cur, script)
+                            self.log_and_print(self._success_message(script, info['rowcount']), 'magenta')
+                else:
+                    part += 1
+                    fpath, payload = self.create_single_inst_file(list(group), part)
+                    self.log_and_print(f'Executing script: {fpath}', 'yellow')
+                    self.execute_script(payload, connection, script_path=path.basename(fpath))
+            self.write_ledger(connection, script_list, True)
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+        finally:
+            connection.autocommit = True
+
+    def _online_index_builds(self):
+        """Statements of the scripts building their indexes concurrently, by script, found once per run"""
+        if self.__index_builds is None:
+            scripts = [script for script in self.script_list if not self._is_data_file(script)]
+            statements = self._io_map(
+                lambda script: online_index_statements(self.read_sql(script.dist_fpath), self.concurrent_indexes),
+                scripts)
+            self.__index_builds = {script.content_fpath: script_statements
+                                   for script, script_statements in zip(scripts, statements)
+                                   if script_statements is not None}
+        return self.__index_builds
+
+    def split_online_index_scripts(self, script_list: list['Script']):
+        """Script list without the scripts building indexes concurrently, and those scripts"""
+        builds = self._online_index_builds()
+        return ([script for script in script_list if script.content_fpath not in builds],
+                [script for script in script_list if script.content_fpath in builds])
+
+    def execute_online_indexes(self, target, script_list: list['Script']):
+        """Run index scripts statement by statement on an autocommit connection of their own, CREATE INDEX
+        CONCURRENTLY can't run in a transaction. Returns the failed script and its error or None"""
+        self.log_and_print(f'Building indexes concurrently, {len(script_list)} scripts...', 'yellow')
+        connection = self._connect(target)
+        try:
+            self.apply_session_settings(connection)
+            for script in script_list:
+                self.log_and_print(f'Executing script: {script.content_fpath}', 'yellow')
+                try:
+                    with self.timings.script(script.content_fpath, self._target_label, connection):
+                        for statement in self.__index_builds[script.content_fpath]:
+                            self._build_index(connection, script, statement)
+                except Exception as e:
+                    return script, e
+                self.write_ledger(connection, [script], True)
+                self.log_and_print('Success', 'magenta')
+        finally:
+            connection.close()
+        return None
 
-            with open(fpath, mode='wt', encoding=self.__encoding) as f1:
-                with open(resource_path(r'misc/start_single_statement.txt'), mode='rt', encoding=self.__encoding) as f2:
-                    st = f2.read()
-                f1.write(st)
+    def _build_index(self, connection, script, statement):
+        if statement.table is None:
+            self.execute_lock_aware(connection, script.content_fpath,
+                                    partial(self._execute_statement, connection, statement.sql))
+            return
 
-                for script in self.script_list:
-                    f1.write(f'{self.read_sql(script.repo_fpath)}\n\n')
+        self._drop_invalid_index(connection, statement)
+        try:
+            self.execute_lock_aware(connection, script.content_fpath,
+                                    partial(self._execute_statement, connection, statement.sql),
+                                    rollback=partial(self._drop_invalid_index, connection, statement))
+        except errors.FeatureNotSupported as e:
+            # e.g. partitioned tables can't be indexed concurrently
+            self._drop_invalid_index(connection, statement)
+            self.log_and_print(f'{str(e).strip()}, the index is built without CONCURRENTLY', 'yellow')
+            self._execute_statement(connection, statement.original)
+        except Exception:
+            self._drop_invalid_index(connection, statement)
+            raise
 
-                with open(resource_path(r'misc/end_single_statement.txt'), mode='rt', encoding=self.__encoding) as f2:
-                    st = f2.read()
+    @staticmethod
+    def _execute_statement(connection, statement):
+        with connection.cursor() as cur:
+            cur.execute(statement)
 
-                f1.write(st)
-            return fpath
+    def _drop_invalid_index(self, connection, statement):
+        """Drop the invalid index a failed concurrent build of the statement left behind, if there is one"""
+        if statement.index is None:
+            return
+        with connection.cursor() as cur:
+            cur.execute('''SELECT format('%%I.%%I', n.nspname, c.relname)
+                           FROM pg_index i
+                           JOIN pg_class c ON c.oid = i.indexrelid
+                           JOIN pg_namespace n ON n.oid = c.relnamespace
+                           WHERE NOT i.indisvalid
+                             AND i.indrelid = to_regclass(%s)
+                             AND c.relname = %s''', (statement.table, statement.index))
+            invalid = cur.fetchone()
+            if invalid is None:
+                return
+            cur.execute(sql.SQL('DROP INDEX CONCURRENTLY IF EXISTS {}').format(sql.SQL(invalid[0])))
+        self.log_and_print(f'Dropped invalid index {invalid[0]} left by a failed concurrent build', 'yellow')
+
+    @timed('preflight')
+    def preflight_check(self):
+        """Check every script of the list before any of them is executed, all problems are reported at once"""
+        if not self.preflight:
+            return
+        scripts = [script for script in self.script_list if not self._is_data_file(script)]
+        hashes = self._io_map(self._script_hash, scripts)
+        if preflight_parser() == 'lexer':
+            self.log_and_print('pglast is not installed, grammar checking is disabled: the pre-flight check finds '
+                               'only unterminated quotes and comments, syntax errors fail the deploy. '
+                               'Install it with pip install pglast', 'yellow', attrs=['bold'])
+        cprint(f'Checking {len(scripts)} scripts({preflight_parser()})...', 'yellow')
+        problems = preflight([(script.content_fpath, script.dist_fpath, content_hash)
+                              for script, content_hash in zip(scripts, hashes)],
+                             single_statement=self.deploy_mode == self.DeployMode.SINGLE_STATEMENT.value,
+                             workers=self.preflight_workers, encoding=self.__encoding, cache=PreflightCache())
+        if problems:
+            for content_fpath, line, message in problems:
+                self.log_and_print(f'{content_fpath}, line {line}: {message}', 'red')
+            self.log_and_print(f'Pre-flight check found {len(problems)} problems, nothing was executed', 'red')
+            sys.exit(1)
+        self.log_and_print(f'Pre-flight check of {len(scripts)} scripts passed', 'light_green')
 
-    def deploy_objects(self):
-        cprint(f'Execute scripts as single statement or separately (single/separate)? '
-               f'Default mode is: {self.deploy_mode}', color='cyan', attrs=['bold'])
-        self.deploy_mode = input().strip()
-        cprint(f'Deploy mode is set to {self.deploy_mode}', 'light_green')
+    @property
+    def _identical_functions_query(self):
+        # definitions are compared from the argument list on, so the names of the copy and the object don't matter
+        return '''WITH objects AS (SELECT * FROM unnest(%s::int[], %s::text[], %s::text[]) AS o(idx, nspname, name)),
+                       definitions AS (SELECT o.idx,
+                                              p.oid AS copy_oid,
+                                              pg_get_functiondef(p.oid) AS copy_def,
+                                              coalesce(o.nspname, current_schema()) AS nspname,
+                                              o.name
+                                       FROM objects o
+                                       JOIN pg_proc p ON p.pronamespace = pg_my_temp_schema()
+                                                     AND p.proname = 'poi_fp_' || o.idx)
+                  SELECT d.idx
+                  FROM definitions d
+                  JOIN pg_namespace n ON n.nspname = d.nspname
+                  JOIN pg_proc p ON p.pronamespace = n.oid AND p.proname = d.name
+                                AND pg_get_function_identity_arguments(p.oid) = pg_get_function_identity_arguments(d.copy_oid)
+                  WHERE md5(substr(pg_get_functiondef(p.oid), strpos(pg_get_functiondef(p.oid), '(')))
+                      = md5(substr(d.copy_def, strpos(d.copy_def, '(')))'''
 
-        if self.deploy_mode not in (_.value for _ in self.DeployMode):
-            raise RuntimeError(colored('Invalid deploy mode', 'red', attrs=['bold']))
+    @property
+    def _identical_views_query(self):
+        return '''SELECT o.idx
+                  FROM unnest(%s::int[], %s::text[], %s::text[]) AS o(idx, nspname, name)
+                  JOIN pg_class t ON t.relnamespace = pg_my_temp_schema() AND t.relname = 'poi_fp_' || o.idx
+                  JOIN pg_namespace n ON n.nspname = coalesce(o.nspname, current_schema())
+                  JOIN pg_class c ON c.relnamespace = n.oid AND c.relname = o.name AND c.relkind = 'v'
+                  WHERE md5(pg_get_viewdef(c.oid)) = md5(pg_get_viewdef(t.oid))
+                    AND coalesce(c.reloptions, '{}') = coalesce(t.reloptions, '{}')'''
+
+    def _identical_objects(self, connection, objects: dict):
+        """Indices of objects whose definition in the database equals the one of the script.
+
+        Every script is run as a copy in pg_temp inside a transaction which is rolled back, and the normalized
+        catalog definitions of the copies and of the objects are compared by a query per object kind.
+        An object whose copy can't be created is treated as changed.
+        """
+        created = []
+        autocommit = connection.autocommit
+        connection.autocommit = False
+        try:
+            with connection.cursor() as cur:
+                items = list(objects.items())
+                for start in range(0, len(items), self.__fingerprint_batch_size):
+                    batch = items[start:start + self.__fingerprint_batch_size]
+                    cur.execute('SAVEPOINT poi_fingerprint')
+                    try:
+                        cur.execute(';\n'.join(temp_copy(obj, f'poi_fp_{i}') for i, obj in batch))
+                        created.extend(batch)
+                        continue
+                    except psycopg2.Error:
+                        cur.execute('ROLLBACK TO SAVEPOINT poi_fingerprint')
+                    # one of the batch failed, the rest is created one by one
+                    for i, obj in batch:
+                        try:
+                            cur.execute(temp_copy(obj, f'poi_fp_{i}'))
+                            cur.execute('RELEASE SAVEPOINT poi_fingerprint')
+                            created.append((i, obj))
+                        except psycopg2.Error:
+                            cur.execute('ROLLBACK TO SAVEPOINT poi_fingerprint')
+                        cur.execute('SAVEPOINT poi_fingerprint')
+
+                identical = set()
+                for kind, query in (('function', self._identical_functions_query),
+                                    ('view', self._identical_views_query)):
+                    of_kind = [(i, obj) for i, obj in created if obj.kind == kind]
+                    if of_kind:
+                        cur.execute(query, ([i for i, _ in of_kind], [obj.schema for _, obj in of_kind],
+                                            [obj.name for _, obj in of_kind]))
+                        identical.update(row[0] for row in cur.fetchall())
+        finally:
+            connection.rollback()
+            connection.autocommit = autocommit
+        return identical
+
+    @timed('skip_identical_objects')
+    def filter_identical_objects(self, connection, script_list: list['Script']):
+        """Drop CREATE OR REPLACE scripts of functions, procedures and views already defined exactly so
+        in the database. A script is kept if any function or view it depends on is executed, tables and other
+        barriers of the dependency graph precede every object and don't keep them
+        """
+        if not self.skip_identical_objects or not script_list:
+            return script_list
+        texts = self._io_map(lambda s: '' if self._is_data_file(s) else self.read_sql(s.dist_fpath), script_list)
+        objects = {i: obj for i, obj in enumerate(map(replaceable_object, texts))
+                   if obj is not None and script_list[i].content_fpath.startswith('OBJ')}
+        if not objects:
+            return script_list
 
-        fpath = self.create_single_inst_file()
+        try:
+            identical = self._identical_objects(connection, objects)
+        except psycopg2.Error as e:
+            self.log_and_print(f'Object definitions can\'t be compared, all scripts will be executed: {e}', 'yellow')
+            return script_list
+
+        graph = build_dependency_graph([(s.content_fpath, text) for s, text in zip(script_list, texts)],
+                                       self._data_file_indices(script_list))
+        skipped = set()
+        for i in sorted(identical):
+            if graph[i] & objects.keys() <= skipped:
+                skipped.add(i)
+                self.log_and_print(f'Object is identical in the database, skipped: {script_list[i].content_fpath}',
+                                   'cyan')
+        self.log_and_print(f'Identical objects skipped: {len(skipped)} of {len(objects)} functions and views',
+                           'light_green')
+        return [script for i, script in enumerate(script_list) if i not in skipped]
 
-        connection = self.check_connection()
+    @property
+    def _relation_sizes_query(self):
+        # partitioned tables are measured with all their partitions. pg_partition_tree returns no rows for
+        # a relation which is neither partitioned nor a partition(ordinary tables, indexes, materialized views),
+        # the sum of them is NULL and coalesce falls back to the relation's own total size. Without a pg_class
+        # row both are NULL, which stands for a relation which doesn't exist yet
+        return '''SELECT o.name,
+                         coalesce((SELECT sum(pg_total_relation_size(t.relid))
+                                   FROM pg_partition_tree(c.oid::regclass) t),
+                                  pg_total_relation_size(c.oid))
+                  FROM unnest(%s::text[]) AS o(name)
+                  LEFT JOIN pg_class c ON c.oid = to_regclass(o.name)'''
 
+    @staticmethod
+    def _size_text(size):
+        for unit in ('B', 'KiB', 'MiB', 'GiB'):
+            if size < 1024:
+                return f'{size:.1f} {unit}'
+            size /= 1024
+        return f'{size:.1f} TiB'
+
+    def _in_maintenance_window(self):
         try:
-            last_hash = self.execute_script(self._last_hash_query, connection, self.DeployType.RELEASE.value)
-        except errors.UndefinedTable:
-            last_hash = None
+            start, end = (datetime.strptime(bound.strip(), '%H:%M').time()
+                          for bound in self.maintenance_window.split('-'))
+        except (AttributeError, ValueError):
+            raise RuntimeError(colored(f'Invalid maintenance_window {self.maintenance_window!r}, '
+                                       f'expected HH:MM-HH:MM', 'red', attrs=['bold']))
+        now = datetime.now().time()
+        # a window like 22:00-06:00 spans midnight
+        return start <= now < end if start <= end else now >= start or now < end
+
+    @timed('ddl_analysis')
+    def schedule_heavy_operations(self, connection, script_list: list['Script']):
+        """Report table rewrites and full scans of the scripts with the sizes of the affected relations, then apply
+        heavy_ddl_policy to the scripts with blocking operations on relations of heavy_ddl_threshold_mb and more:
+        keep the order(report), move them and the scripts depending on them to the end(last), do so only within
+        maintenance_window(window) or refuse the deploy(refuse)"""
+        if self.heavy_ddl_policy not in (_.value for _ in self.HeavyDdlPolicy):
+            raise RuntimeError(colored(f'Invalid heavy_ddl_policy {self.heavy_ddl_policy!r}', 'red', attrs=['bold']))
+        texts = self._io_map(lambda s: '' if self._is_data_file(s) else self.read_sql(s.dist_fpath), script_list)
+        operations = [[op for op in analyze_sql(text) if op.impact is not None] for text in texts]
+        relations = sorted({regclass_text(op.relation) for script_operations in operations for op in script_operations})
+        if not relations:
+            return script_list
+
+        with connection.cursor() as cur:
+            cur.execute(self._relation_sizes_query, (relations,))
+            sizes = dict(cur.fetchall())
+
+        threshold = self.heavy_ddl_threshold_mb * 1024 * 1024
+        heavy = set()
+        self.log_and_print('Table rewrites and scans of the deploy:', 'light_magenta', attrs=['bold'])
+        for i, (script, script_operations) in enumerate(zip(script_list, operations)):
+            for op in script_operations:
+                name = regclass_text(op.relation)
+                size = sizes.get(name)
+                is_heavy = size is not None and size >= threshold and is_blocking(op)
+                if is_heavy:
+                    heavy.add(i)
+                impact = 'new relation' if size is None else f'{op.impact} of {self._size_text(size)}'
+                self.log_and_print(f'{script.content_fpath}: {op.action} of {name}, {impact} under {op.lock} lock'
+                                   f'{" [heavy]" if is_heavy else ""}', 'yellow' if is_heavy else 'cyan')
+        if not heavy or self.heavy_ddl_policy == self.HeavyDdlPolicy.REPORT.value:
+            return script_list
+
+        if self.heavy_ddl_policy == self.HeavyDdlPolicy.REFUSE.value:
+            raise RuntimeError(f'{len(heavy)} scripts have blocking operations on relations of '
+                               f'{self.heavy_ddl_threshold_mb} MB and more, deploy is refused by heavy_ddl_policy')
+        if self.heavy_ddl_policy == self.HeavyDdlPolicy.WINDOW.value and not self._in_maintenance_window():
+            raise RuntimeError(f'{len(heavy)} scripts have blocking operations on relations of '
+                               f'{self.heavy_ddl_threshold_mb} MB and more, they can be deployed only within '
+                               f'maintenance window {self.maintenance_window}')
+
+        graph = build_dependency_graph([(s.content_fpath, text) for s, text in zip(script_list, texts)],
+                                       self._data_file_indices(script_list))
+        deferred = set()
+        for i in range(len(script_list)):
+            if i in heavy or graph[i] & deferred:
+                deferred.add(i)
+        self.log_and_print(f'{len(heavy)} heavy scripts and {len(deferred) - len(heavy)} scripts depending on them '
+                           f'are moved to the end of the deploy', 'yellow')
+        return [s for i, s in enumerate(script_list) if i not in deferred] + \
+               [s for i, s in enumerate(script_list) if i in deferred]
+
+    @timed('deploy')
+    def deploy_to(self, connection, target) -> bool:
+        """Deploy the prepared script list to one target, a failed deploy is logged and reported as False"""
+        if self.ledger_table is not None:
+            self._ensure_ledger(connection)
+        self.apply_session_settings(connection)
+        script_list = self.filter_applied_scripts(connection, self._target_scripts())
+        if self.deploy_mode != self.DeployMode.SINGLE_STATEMENT.value:
+            script_list = self.resume_point(connection, script_list)
+        script_list = self.filter_identical_objects(connection, script_list)
+        script_list, index_scripts = self.split_online_index_scripts(script_list)
+        try:
+            script_list = self.schedule_heavy_operations(connection, script_list)
+        except RuntimeError as e:
+            self.write_log(connection, False)
+            self.log_and_print(e, 'red')
+            return False
+
+        try:
+            failure = None
+            if self.deploy_mode == self.DeployMode.SINGLE_STATEMENT.value:
+                try:
+                    if any(self._is_data_file(script) for script in script_list):
+                        self.execute_single_with_data(connection, script_list)
+                    else:
+                        fpath, payload = self.create_single_inst_file(script_list)
+                        self.log_and_print(f'Executing script: {fpath}', 'yellow')
+                        self.execute_lock_aware(connection, path.basename(fpath),
+                                                partial(self.execute_script, payload, connection,
+                                                        script_path=path.basename(fpath)))
+                        self.write_ledger(connection, script_list, True)
+                except Exception as e:
+                    failure = None, e
 
-        if last_hash:
-            last_hash = last_hash[0].split()[-1]
+            elif self.deploy_mode == self.DeployMode.TRANSACTIONAL.value:
+                try:
+                    failure = self.execute_transactional(connection, script_list)
+                except Exception as e:
+                    failure = None, e
 
-            if last_hash == self._commit:
-                cprint(f'Commit {last_hash} is already installed last, do you want to proceed anyway?(y/n)'
-                       , color='yellow', attrs=['bold'])
-                answer = input().strip().lower()
-                if answer == 'n':
-                    sys.exit()
+            elif self.parallel_workers > 1:
+                failure = self.execute_parallel(script_list, target)
 
-        if self.deploy_mode == self.DeployMode.SINGLE_STATEMENT.value:
+            else:
+                failure = self.execute_separate(connection, script_list)
+
+            if failure is None and index_scripts:
+                failure = self.execute_online_indexes(target, index_scripts)
+
+            cprint(f'Logging ci info...', 'yellow')
+            if failure is None:
+                self.write_log(connection, True)
+                return True
+
+            script, e = failure
+            if script is not None:
+                self.write_ledger(connection, [script], False, error=str(e).strip())
+            self.write_log(connection, False)
+            self.log_and_print(e if script is None else f'{script.content_fpath}: {e}', 'red')
+            self.log_and_print('Got errors during deploy execution, further execution is stopped', 'red')
+            return False
+        finally:
+            self.apply_ledger_retention(connection)
 
+    def _deploy_to_target(self, connection, target):
+        self._target_label = target.label
+        try:
+            return self.deploy_to(connection, target)
+        except Exception as e:
+            self.log_and_print(e, 'red')
+            return False
+        finally:
+            self._target_label = None
+
+    def deploy_to_targets(self):
+        """Deploy the prepared dist folder to every configured target concurrently"""
+        self.ask_credentials()
+        deployments = []
+        results = {target.label: False for target in self.db_targets}
+        for target in self.db_targets:
             try:
-                self.log_and_print(f'Executing script: {fpath}', 'yellow')
-                self.execute_script(self.read_sql(fpath), connection)
-                cprint(f'Logging ci info...', 'yellow')
-                self.execute_script(self.get_log_dml(True), connection)
-            except Exception as e:
-                cprint(f'Logging ci info...', 'yellow')
-                self.execute_script(self.get_log_dml(False), connection)
-                self.log_and_print(e, 'red')
-                self.log_and_print('Got errors during deploy execution, further execution is stopped', 'red')
+                deployments.append((self._target_connection(target), target))
+            except psycopg2.Error as e:
+                self.log_and_print(f'[{target.label}] Connection failed: {e}', 'red')
+
+        installed = []
+        for connection, target in deployments:
+            # history indexes are checked once per target
+            self._target_label = target.label
+            try:
+                if self._last_deployed_commit(connection, self.repo_properties.folder) == self._commit:
+                    installed.append(target.label)
+            finally:
+                self._target_label = None
+        if installed:
+            cprint(f'Commit {self._commit} is already installed last on:\n' + '\n'.join(installed) +
+                   '\ndo you want to proceed anyway?(y/n)', color='yellow', attrs=['bold'])
+            answer = self._ask().lower()
+            if answer == 'n':
                 sys.exit()
 
-        else:
-            for script in self.script_list:
-                try:
-                    self.log_and_print(f'Executing script: {script.content_fpath}', 'yellow')
-                    self.execute_script(self.read_sql(script.dist_fpath), connection)
-                except Exception as e:
-                    cprint(f'Logging ci info...', 'yellow')
-                    self.execute_script(self.get_log_dml(False), connection)
-                    self.log_and_print(e, 'red')
-                    self.log_and_print('Got errors during deploy execution, further execution is stopped', 'red')
-                    sys.exit()
+        cprint(f'Deploying to {len(deployments)} targets, up to {self.fanout_workers} at a time...', 'yellow')
+        with ThreadPoolExecutor(max_workers=self.fanout_workers) as executor:
+            futures = {executor.submit(self._deploy_to_target, connection, target): target.label
+                       for connection, target in deployments}
+            for future in as_completed(futures):
+                results[futures[future]] = future.result()
+
+        self.log_and_print('Deploy summary:', 'light_magenta', attrs=['bold'])
+        for label, is_successful in results.items():
+            self.log_and_print(f'{label}: {"success" if is_successful else "FAILED"}',
+                               'light_green' if is_successful else 'red')
+        if not all(results.values()):
+            sys.exit(1)
+
+    def reset_run(self):
+        """Forget the state of the previous deploy, the clone and connections are kept"""
+        self.__dist_folder_name = None
+        self.__release_branch = None
+        self.__revert_branch = None
+        self.__release_commit = None
+        self.__revert_commit = None
+        self.__blobs = None
+        self.__script_hashes = {}
+        self.__copy_specs = {}
+        self.__index_builds = None
+        self.script_list = None
+        self.deleted_objects = []
+        self.__target_paths = None
+        self.run_id = str(uuid4())
+        self.timings = DeployTimings()
+        return self
+
+    def deploy_folders(self, folders):
+        """Deploy several Requests folders in order, reusing one clone and one connection"""
+        for i, folder in enumerate(folders, start=1):
+            cprint(f'Deploying folder {i} of {len(folders)}: {folder}', 'light_magenta', attrs=['bold'])
+            self.reset_run()
+            self.repo_properties.folder = folder
+            self.handle_deploy_path().deploy_objects()
+        return self
+
+    def deploy_objects(self):
+        cprint(f'Execute scripts as single statement, separately or separately in one transaction '
+               f'(single/separate/transactional)? '
+               f'Default mode is: {self.deploy_mode}', color='cyan', attrs=['bold'])
+        self.deploy_mode = self._ask()
+        cprint(f'Deploy mode is set to {self.deploy_mode}', 'light_green')
+
+        if self.deploy_mode not in (_.value for _ in self.DeployMode):
+            raise RuntimeError(colored('Invalid deploy mode', 'red', attrs=['bold']))
+
+        self.log_and_print(f'Deploy run id: {self.run_id}', 'light_magenta')
+        self.preflight_check()
+        try:
+            if len(self.db_targets) > 1:
+                self.deploy_to_targets()
             else:
-                cprint(f'Logging ci info...', 'yellow')
-                self.execute_script(self.get_log_dml(True), connection)
+                self._deploy_to_single_target()
+        finally:
+            self.close_monitor_connections()
+            self.report_timings()
+
+    def _deploy_to_single_target(self):
+        connection = self._connection()
+
+        last_hash = self._last_deployed_commit(connection, self.repo_properties.folder)
+
+        if last_hash == self._commit:
+            cprint(f'Commit {last_hash} is already installed last, do you want to proceed anyway?(y/n)'
+                   , color='yellow', attrs=['bold'])
+            answer = self._ask().lower()
+            if answer == 'n':
+                sys.exit()
+
+        if not self.deploy_to(connection, self.db_properties):
+            sys.exit(1)
+
+
+def _parse_args():
+    def env(name):
+        return getenv(f'POI_{name}')
+
+    def env_flag(name):
+        # POI_BATCH=0 or false leaves the flag off, as an empty or missing variable does
+        return (env(name) or '').strip().lower() in ('1', 'true', 'yes', 'on')
+
+    parser = ArgumentParser(description='Deployment automation tool for Postgresql database objects. '
+                                        'Options not given on the command line are read from POI_<OPTION> '
+                                        'environment variables(e.g. POI_RELEASE_BRANCH), then from the config file')
+    parser.add_argument('--force', action='store_true',
+                        help='execute all scripts, even those whose content was already applied to the database')
+    parser.add_argument('--resume', action='store_true',
+                        help='skip scripts already committed by earlier runs for the same folder and commit')
+    parser.add_argument('--batch', action='store_true', default=env_flag('BATCH'),
+                        help='non-interactive mode, every prompt takes its default; the password is read from '
+                             'POI_DB_PASSWORD or PGPASSWORD environment variable')
+    parser.add_argument('--config', default=env('CONFIG'), help='config file name from configs folder')
+    parser.add_argument('--validate-only', action='store_true',
+                        help='validate the config files and exit without touching the repository or the database')
+    parser.add_argument('--folders', nargs='+', default=env('FOLDERS').split() if env('FOLDERS') else None,
+                        help='Requests subfolders to deploy one after another with one clone and connection')
+    parser.add_argument('--deploy-type', default=env('DEPLOY_TYPE'), choices=('release', 'revert'))
+    parser.add_argument('--deploy-mode', default=env('DEPLOY_MODE'))
+    for option in ('remote_path', 'local_path', 'dist_path', 'release_branch', 'revert_branch'):
+        parser.add_argument(f'--{option.replace("_", "-")}', default=env(option.upper()))
+    for option in ('host', 'dbname', 'user'):
+        parser.add_argument(f'--{option}', default=env(option.upper()))
+    parser.add_argument('--port', type=int, default=env('PORT'))
+    return parser.parse_args()
+
+
+def _apply_args(config, args):
+    for option in ('remote_path', 'release_branch', 'revert_branch'):
+        if getattr(args, option):
+            config['repo'][option] = getattr(args, option)
+    for option in ('local_path', 'dist_path'):
+        if getattr(args, option):
+            config['repo'][option] = {'env': None, 'path': getattr(args, option)}
+    if args.folders:
+        config['repo']['folder'] = args.folders[0]
+
+    connections = config['db']['connection']
+    for connection in connections if isinstance(connections, list) else [connections]:
+        for option in ('host', 'port', 'dbname', 'user'):
+            if getattr(args, option):
+                connection[option] = int(getattr(args, option)) if option == 'port' else getattr(args, option)
+
+    if args.deploy_mode:
+        config['misc']['deploy_mode'] = args.deploy_mode
+    return config
 
 
 if __name__ == '__main__':
+    # pre-flight check workers of the frozen app start as copies of the exe
+    freeze_support()
+    args = _parse_args()
+
+    from colorama import just_fix_windows_console
+
     just_fix_windows_console()
     try:
-        validator = PropertiesValidator()
-        config = validator.validate_properties()
-
-        pg_builder = PostgresObjInstaller(config)
-        pg_builder.clone_repo() \
-            .handle_deploy_path() \
-            .deploy_objects()
+        validator = PropertiesValidator(interactive=not args.batch, selected_config=args.config)
+        config = _apply_args(validator.validate_properties(), args)
+        if args.validate_only:
+            sys.exit()
+
+        pg_builder = PostgresObjInstaller(config, force=args.force, resume=args.resume, interactive=not args.batch)
+        if args.deploy_type:
+            pg_builder.deploy_type = args.deploy_type
+        pg_builder.clone_repo()
+        if args.folders:
+            pg_builder.deploy_folders(args.folders)
+        else:
+            pg_builder.handle_deploy_path() \
+                .deploy_objects()
     except Exception:
         print(colored(sys.exc_info()[0], 'red'))
         from traceback import format_exc
 
         print(colored(format_exc(), 'red'))
+        if args.batch:
+            sys.exit(1)
     finally:
-        cprint('Press Enter to close the window', 'light_red')
-        input()
+        if not args.batch:
+            cprint('Press Enter to close the window', 'light_red')
+            input()
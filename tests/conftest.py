@@ -0,0 +1,106 @@
+""" Installer fixtures working without a database: connections answer queries from a list of canned results """
+from os import makedirs, path
+
+import pytest
+
+import postgres_builder
+
+
+class FakeCursor:
+    def __init__(self, connection):
+        self.connection = connection
+        self.rowcount = 0
+        self._rows = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, query, args=None):
+        self.connection.queries.append((query, args))
+        rows = self.connection.results.pop(0) if self.connection.results else []
+        if isinstance(rows, Exception):
+            raise rows
+        self._rows = rows
+        self.rowcount = len(rows)
+
+    def fetchone(self):
+        return self._rows[0] if self._rows else None
+
+    def fetchall(self):
+        return list(self._rows)
+
+
+class FakeConnection:
+    """ Every executed query takes the next list of rows from results, an empty one when they run out,
+    an exception in results is raised by the query instead """
+
+    def __init__(self, results=None):
+        self.results = list(results or [])
+        self.queries = []
+        self.autocommit = True
+        self.closed = 0
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def get_backend_pid(self):
+        return 1
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+
+def properties(tmp_path, **misc):
+    return {
+        'repo': {
+            'remote_path': str(tmp_path / 'remote'),
+            'local_path': {'env': None, 'path': str(tmp_path / 'clone')},
+            'dist_path': {'env': None, 'path': str(tmp_path / 'dist')},
+            'release_branch': 'master',
+            'folder': 'TEST-1'
+        },
+        'db': {
+            'connection': {'host': 'localhost', 'port': 5432, 'dbname': 'test', 'user': 'tester'},
+            'log_table': 'main.log_ci_results'
+        },
+        'misc': {'deploy_mode': 'separate', **misc}
+    }
+
+
+@pytest.fixture
+def make_installer(tmp_path):
+    """ Build an installer with extra keys of misc cfg section, its dist folder is tmp_path/dist/run """
+
+    def make(**misc):
+        installer = postgres_builder.PostgresObjInstaller(properties(tmp_path, **misc), interactive=False)
+        makedirs(tmp_path / 'dist' / 'run', exist_ok=True)
+        installer.dist_folder_name = 'run'
+        return installer
+
+    return make
+
+
+@pytest.fixture
+def installer(make_installer):
+    return make_installer()
+
+
+@pytest.fixture
+def write_script(tmp_path):
+    """ Create a script in the dist folder, returns its Script tuple """
+
+    def write(content_fpath, sql_text):
+        dist_fpath = path.join(tmp_path, 'dist', 'run', content_fpath)
+        makedirs(path.dirname(dist_fpath), exist_ok=True)
+        with open(dist_fpath, mode='wt', encoding='UTF-8') as f:
+            f.write(sql_text)
+        return postgres_builder.PostgresObjInstaller.Script(path.join(tmp_path, 'clone', content_fpath),
+                                                            content_fpath, dist_fpath)
+
+    return write
@@ -0,0 +1,35 @@
+import pytest
+
+import postgres_builder
+from tests.conftest import properties
+
+
+@pytest.mark.parametrize('value, expected', [('1', True), ('true', True), ('Yes', True), ('0', False),
+                                             ('false', False), ('', False)])
+def test_batch_env_variable(monkeypatch, value, expected):
+    monkeypatch.setenv('POI_BATCH', value)
+    monkeypatch.setattr('sys.argv', ['postgres_builder.py'])
+
+    assert postgres_builder._parse_args().batch is expected
+
+
+def test_batch_mode_rejects_invalid_requested_config():
+    validator = postgres_builder.PropertiesValidator(interactive=False, selected_config='missing.json')
+    validator._valid_configs = ['default_properties.json']
+    validator._selected_config = 'default_properties.json'
+
+    with pytest.raises(FileNotFoundError):
+        validator._prompt_user_selection()
+
+
+def test_folders_deployed_within_one_second_get_dist_folders_of_their_own(tmp_path):
+    installer = postgres_builder.PostgresObjInstaller(properties(tmp_path), interactive=False)
+    installer._PostgresObjInstaller__release_branch = 'master'
+    installer.create_dist_folder()
+    first = installer.dist_folder_name
+    installer.reset_run()
+    installer._PostgresObjInstaller__release_branch = 'master'
+    installer.create_dist_folder()
+
+    assert installer.dist_folder_name != first
+    assert (tmp_path / 'dist' / first).is_dir() and (tmp_path / 'dist' / installer.dist_folder_name).is_dir()
@@ -0,0 +1,19 @@
+from poi_lib import build_dependency_graph
+
+
+def test_data_file_in_obj_waits_for_its_table():
+    scripts = [('OBJ/Schemas/app/Tables/users.sql', 'CREATE TABLE app.users(id int)'),
+               ('OBJ/Schemas/app/Data/users.csv', ''),
+               ('OBJ/Schemas/app/Views/v_users.sql', 'CREATE VIEW app.v_users AS SELECT id FROM app.users')]
+
+    graph = build_dependency_graph(scripts, barriers={1})
+
+    assert graph[1] == {0}
+    assert graph[2] == {0, 1}
+
+
+def test_independent_obj_scripts_have_no_dependencies():
+    scripts = [('OBJ/Schemas/app/Tables/a.sql', 'CREATE TABLE app.a(id int)'),
+               ('OBJ/Schemas/app/Tables/b.sql', 'CREATE TABLE app.b(id int)')]
+
+    assert build_dependency_graph(scripts) == {0: set(), 1: set()}
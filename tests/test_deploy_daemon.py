@@ -0,0 +1,70 @@
+from concurrent.futures import ThreadPoolExecutor
+from http.client import HTTPConnection
+from http.server import ThreadingHTTPServer
+from threading import Thread
+from unittest import mock
+
+import deploy_daemon
+from tests.conftest import properties
+
+
+def test_job_closes_its_log_when_it_fails(tmp_path, monkeypatch):
+    daemon = deploy_daemon.DeployDaemon(properties(tmp_path))
+    installer = mock.Mock(db_targets=[mock.Mock(label='localhost:5432/test')])
+    installer.clone_repo.side_effect = RuntimeError('remote is unavailable')
+    monkeypatch.setattr(daemon, 'installer', lambda job: installer)
+    monkeypatch.setattr(daemon, '_pool', lambda target: mock.Mock(getconn=lambda: mock.Mock(closed=0)))
+    daemon._pools['localhost:5432/test'] = mock.Mock()
+
+    assert daemon.run_job({}, lambda line: None) is False
+    installer.close_log.assert_called_once()
+    # connections are given to the installer before the scripts are prepared
+    assert installer.mock_calls.index(mock.call.use_connections(mock.ANY)) < \
+           installer.mock_calls.index(mock.call.clone_repo())
+
+
+def test_concurrent_jobs_get_distinct_numbers(tmp_path):
+    daemon = deploy_daemon.DeployDaemon(properties(tmp_path))
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        numbers = list(executor.map(lambda _: daemon.next_job(), range(200)))
+
+    assert sorted(numbers) == list(range(1, 201))
+    assert daemon.jobs == 200
+
+
+def test_invalid_job_is_reported_as_failed(tmp_path):
+    daemon = deploy_daemon.DeployDaemon(properties(tmp_path))
+    lines = []
+
+    assert daemon.run_job({'deploy_mode': 'paralel'}, lines.append) is False
+    assert lines and lines[-1].startswith('ValueError')
+
+
+def test_job_which_is_not_an_object_is_rejected(tmp_path):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), deploy_daemon.DeployRequestHandler)
+    server.deploy_daemon = deploy_daemon.DeployDaemon(properties(tmp_path))
+    Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        connection = HTTPConnection('127.0.0.1', server.server_address[1], timeout=10)
+        connection.request('POST', '/deploy', body=b'["TEST-1"]')
+        response = connection.getresponse()
+        response.read()
+        connection.close()
+
+        assert response.status == 400
+        assert server.deploy_daemon.jobs == 0
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_jobs_prepared_within_one_second_get_dist_folders_of_their_own(tmp_path):
+    daemon = deploy_daemon.DeployDaemon(properties(tmp_path))
+    names = []
+    for installer in (daemon.installer({}), daemon.installer({})):
+        installer._PostgresObjInstaller__release_branch = 'master'
+        installer.create_dist_folder()
+        names.append(installer.dist_folder_name)
+
+    assert names[0] != names[1]
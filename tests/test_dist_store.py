@@ -0,0 +1,34 @@
+from os import path, stat
+
+import pytest
+
+from poi_lib import DistStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return DistStore(str(tmp_path / 'dist'))
+
+
+def test_script_listed_twice_is_linked_once(store, tmp_path):
+    src = tmp_path / 'a.sql'
+    src.write_text('CREATE TABLE app.a(id int)')
+    object_fpath = store.put_file(str(src))
+    dist_fpath = str(tmp_path / 'a_dist.sql')
+
+    store.link(object_fpath, dist_fpath)
+    store.link(object_fpath, dist_fpath)
+
+    assert store.can_link
+    assert path.samefile(object_fpath, dist_fpath)
+
+
+def test_stored_content_is_not_copied_again(store, tmp_path, monkeypatch):
+    src = tmp_path / 'a.sql'
+    src.write_text('CREATE TABLE app.a(id int)')
+    object_fpath = store.put_file(str(src))
+    mtime = stat(object_fpath).st_mtime_ns
+    monkeypatch.setattr('poi_lib.dist_store.shutil.copyfile', pytest.fail)
+
+    assert store.put_file(str(src)) == object_fpath
+    assert stat(object_fpath).st_mtime_ns == mtime
@@ -0,0 +1,45 @@
+from os import makedirs
+
+import psycopg2
+import pytest
+
+import postgres_builder
+from tests.conftest import FakeConnection, properties
+
+
+@pytest.fixture
+def fanout_installer(tmp_path):
+    config = properties(tmp_path)
+    config['db']['connection']['dbname'] = ['shard_01', 'shard_02']
+    installer = postgres_builder.PostgresObjInstaller(config, interactive=False)
+    makedirs(tmp_path / 'dist' / 'run', exist_ok=True)
+    installer.dist_folder_name = 'run'
+    return installer
+
+
+def test_unreachable_first_target_is_reported_as_failed(fanout_installer, monkeypatch, capsys):
+    first, second = fanout_installer.db_targets
+    labels = []
+
+    def connect(target):
+        if target is first:
+            raise psycopg2.OperationalError('could not connect to server')
+        return FakeConnection()
+
+    def last_deployed_commit(connection, folder=None):
+        labels.append(fanout_installer._target_label)
+
+    monkeypatch.setattr(fanout_installer, '_connect', connect)
+    monkeypatch.setattr(fanout_installer, '_ask_password', lambda: 'secret')
+    monkeypatch.setattr(fanout_installer, '_last_deployed_commit', last_deployed_commit)
+    monkeypatch.setattr(fanout_installer, '_deploy_to_target', lambda connection, target: True)
+
+    with pytest.raises(SystemExit) as exit_info:
+        fanout_installer.deploy_to_targets()
+
+    assert exit_info.value.code == 1
+    output = capsys.readouterr().out
+    assert f'{first.label}: FAILED' in output
+    assert f'{second.label}: success' in output
+    # every target checks its own history indexes
+    assert labels == [second.label]
@@ -0,0 +1,34 @@
+import pytest
+
+from tests.conftest import FakeConnection
+
+GIB = 1024 ** 3
+
+
+def test_rewrite_of_table_below_threshold_or_missing_keeps_its_place(make_installer, write_script):
+    installer = make_installer(heavy_ddl_policy='last', heavy_ddl_threshold_mb=1)
+    rewrite = write_script('OBJ/Schemas/app/Tables/orders.sql', 'ALTER TABLE app.orders ALTER COLUMN id TYPE bigint')
+    new_table = write_script('OBJ/Schemas/app/Tables/items.sql', 'ALTER TABLE app.items ALTER COLUMN id TYPE bigint')
+    view = write_script('OBJ/Schemas/app/Views/v.sql', 'CREATE OR REPLACE VIEW app.v AS SELECT 1')
+    # NULL size stands for a relation which doesn't exist yet
+    connection = FakeConnection([[('"app"."items"', None), ('"app"."orders"', 1024)]])
+
+    assert installer.schedule_heavy_operations(connection, [rewrite, new_table, view]) == [rewrite, new_table, view]
+
+
+def test_rewrite_of_plain_table_above_threshold_is_moved_to_the_end(make_installer, write_script):
+    installer = make_installer(heavy_ddl_policy='last', heavy_ddl_threshold_mb=1)
+    rewrite = write_script('OBJ/Schemas/app/Tables/orders.sql', 'ALTER TABLE app.orders ALTER COLUMN id TYPE bigint')
+    view = write_script('OBJ/Schemas/app/Views/v.sql', 'CREATE OR REPLACE VIEW app.v AS SELECT 1')
+    connection = FakeConnection([[('"app"."orders"', 2 * GIB)]])
+
+    assert installer.schedule_heavy_operations(connection, [rewrite, view]) == [view, rewrite]
+
+
+def test_rewrite_of_plain_table_above_threshold_is_refused(make_installer, write_script):
+    installer = make_installer(heavy_ddl_policy='refuse', heavy_ddl_threshold_mb=1)
+    rewrite = write_script('OBJ/Schemas/app/Tables/orders.sql', 'ALTER TABLE app.orders ALTER COLUMN id TYPE bigint')
+    connection = FakeConnection([[('"app"."orders"', 2 * GIB)]])
+
+    with pytest.raises(RuntimeError):
+        installer.schedule_heavy_operations(connection, [rewrite])
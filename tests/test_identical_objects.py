@@ -0,0 +1,24 @@
+from tests.conftest import FakeConnection
+
+
+def test_identical_objects_after_table_and_data_file_are_skipped(make_installer, write_script, monkeypatch):
+    installer = make_installer(skip_identical_objects=True)
+    scripts = [write_script('OBJ/Schemas/app/Tables/users.sql', 'CREATE TABLE app.users(id int)'),
+               write_script('OBJ/Schemas/app/Data/users.csv', 'id\n1\n'),
+               write_script('OBJ/Schemas/app/Functions/f.sql',
+                            'CREATE OR REPLACE FUNCTION app.f() RETURNS int LANGUAGE sql AS $$ SELECT 1 $$'),
+               write_script('OBJ/Schemas/app/Views/v.sql', 'CREATE OR REPLACE VIEW app.v AS SELECT app.f()')]
+    monkeypatch.setattr(installer, '_identical_objects', lambda connection, objects: set(objects))
+
+    assert installer.filter_identical_objects(FakeConnection(), scripts) == scripts[:2]
+
+
+def test_object_depending_on_changed_object_is_kept(make_installer, write_script, monkeypatch):
+    installer = make_installer(skip_identical_objects=True)
+    scripts = [write_script('OBJ/Schemas/app/Functions/f.sql',
+                            'CREATE OR REPLACE FUNCTION app.f() RETURNS int LANGUAGE sql AS $$ SELECT 2 $$'),
+               write_script('OBJ/Schemas/app/Views/v.sql', 'CREATE OR REPLACE VIEW app.v AS SELECT app.f()')]
+    # only the view is identical, the changed function it calls is executed
+    monkeypatch.setattr(installer, '_identical_objects', lambda connection, objects: {1})
+
+    assert installer.filter_identical_objects(FakeConnection(), scripts) == scripts
@@ -0,0 +1,132 @@
+from hashlib import sha256
+import psycopg2.errors
+import pytest
+
+from tests.conftest import FakeConnection
+
+
+def _hash(sql_text):
+    return sha256(sql_text.encode()).hexdigest()
+
+
+def test_unchanged_script_is_skipped(installer, write_script):
+    view = write_script('OBJ/Schemas/app/Views/v.sql', 'CREATE OR REPLACE VIEW app.v AS SELECT 2')
+    connection = FakeConnection([[(view.content_fpath, _hash('CREATE OR REPLACE VIEW app.v AS SELECT 2'))]])
+
+    assert installer.filter_applied_scripts(connection, [view]) == []
+
+
+def test_script_reverted_to_older_content_is_executed(installer, write_script):
+    # v1 was applied, then v2; the ledger query returns the latest success of the path only
+    view = write_script('OBJ/Schemas/app/Views/v.sql', 'CREATE OR REPLACE VIEW app.v AS SELECT 1')
+    connection = FakeConnection([[(view.content_fpath, _hash('CREATE OR REPLACE VIEW app.v AS SELECT 2'))]])
+
+    assert installer.filter_applied_scripts(connection, [view]) == [view]
+    _, args = connection.queries[0]
+    assert args == ([view.content_fpath],)
+
+
+def test_never_applied_script_is_executed(installer, write_script):
+    table = write_script('OBJ/Schemas/app/Tables/t.sql', 'CREATE TABLE app.t(id int)')
+
+    assert installer.filter_applied_scripts(FakeConnection(), [table]) == [table]
+
+
+def test_unavailable_ledger_of_one_target_keeps_the_others(installer, write_script):
+    table = write_script('OBJ/Schemas/app/Tables/t.sql', 'CREATE TABLE app.t(id int)')
+    installer._target_label = 'db-1'
+    installer._ensure_ledger(FakeConnection([psycopg2.errors.InsufficientPrivilege('permission denied')]))
+    installer._target_label = 'db-2'
+    installer._ensure_ledger(FakeConnection())
+
+    connection = FakeConnection()
+    installer.write_ledger(connection, [table], True)
+    assert len(connection.queries) == 1
+
+    installer._target_label = 'db-1'
+    connection = FakeConnection()
+    installer.write_ledger(connection, [table], True)
+    assert connection.queries == []
+
+
+def test_batch_writes_its_ledger_rows_in_the_same_query(installer, write_script):
+    scripts = [write_script(f'OBJ/Schemas/app/Views/v{i}.sql', f'CREATE OR REPLACE VIEW app.v{i} AS SELECT {i}')
+               for i in range(2)]
+    connection = FakeConnection()
+
+    assert installer._execute_batch(connection, [(s, installer.read_sql(s.dist_fpath)) for s in scripts])
+    (_, params), = connection.queries
+    assert params[0] == [s.content_fpath for s in scripts]
+    assert params[3] == [True, True]
+
+
+def test_interrupted_separate_deploy_keeps_checkpoints_of_executed_scripts(installer, write_script):
+    first = write_script('OBJ/Schemas/app/Tables/a.sql', 'CREATE TABLE app.a(id int)')
+    second = write_script('OBJ/Schemas/app/Tables/b.sql', 'CREATE TABLE app.b(id int)')
+    # the deploy stops at the second script, the ledger row of the first one is written already
+    connection = FakeConnection([[], [], psycopg2.errors.QueryCanceled('canceling statement')])
+
+    assert installer.execute_separate(connection, [first, second])[0] == second
+    _, params = connection.queries[1]
+    assert params[0] == [first.content_fpath]
+
+
+def test_complete_ledger_is_not_altered(installer):
+    connection = FakeConnection([[]])
+
+    installer._ensure_ledger(connection)
+
+    assert len(connection.queries) == 1
+
+
+def test_ledger_missing_a_column_is_upgraded(installer):
+    connection = FakeConnection([[('duration_ms',)]])
+
+    installer._ensure_ledger(connection)
+
+    assert len(connection.queries) == 2
+    assert installer._uses_ledger
+
+
+def test_resume_executes_scripts_of_a_rolled_back_transaction(installer, write_script):
+    scripts = [write_script(f'OBJ/Schemas/app/Tables/{name}.sql', f'CREATE TABLE app.{name}(id int)')
+               for name in 'abc']
+    installer.resume = True
+    # b failed and its transaction with a was rolled back, so only the failure of b is in the ledger
+    connection = FakeConnection([[(scripts[1].content_fpath, False)]])
+
+    assert installer.resume_point(connection, scripts) == scripts
+
+
+def test_resume_skips_committed_scripts_only(installer, write_script):
+    scripts = [write_script(f'OBJ/Schemas/app/Tables/{name}.sql', f'CREATE TABLE app.{name}(id int)')
+               for name in 'abc']
+    installer.resume = True
+    # a parallel deploy committed c and failed on a before starting b
+    connection = FakeConnection([[(scripts[2].content_fpath, True), (scripts[0].content_fpath, False)]])
+
+    assert installer.resume_point(connection, scripts) == scripts[:2]
+
+
+def test_batched_scripts_get_their_shares_of_the_batch_duration(installer, write_script):
+    scripts = [write_script('OBJ/Schemas/app/Views/v0.sql', 'COMMENT ON VIEW app.v0 IS NULL'),
+               write_script('OBJ/Schemas/app/Views/v1.sql', 'COMMENT ON VIEW app.v1 IS \'view one, longer\'')]
+    texts = [installer.read_sql(s.dist_fpath) for s in scripts]
+    connection = FakeConnection()
+
+    assert installer._execute_batch(connection, list(zip(scripts, texts)))
+    (_, params), = connection.queries
+    shares = [len(text) / sum(map(len, texts)) for text in texts]
+    assert params[6] == shares
+    timings = [installer.timings.duration(s.content_fpath) for s in scripts]
+    assert timings[0] / sum(timings) == pytest.approx(shares[0])
+
+
+def test_invalid_history_index_is_built_again_concurrently(installer):
+    connection = FakeConnection([[('"main"."log_ci_results_last_deploy_idx"', True)]])
+
+    installer._ensure_history_indexes(connection)
+
+    (_, _), (drop, _), (create, _) = connection.queries
+    assert 'DROP INDEX CONCURRENTLY' in repr(drop)
+    assert 'CREATE INDEX CONCURRENTLY' in repr(create)
@@ -0,0 +1,15 @@
+from poi_lib import online_index_statements
+
+
+def test_named_index_is_built_concurrently():
+    statement, = online_index_statements('CREATE INDEX ix_t_a ON app.t (a)')
+
+    assert statement.sql.startswith('CREATE INDEX CONCURRENTLY ix_t_a')
+    assert statement.index == 'ix_t_a'
+
+
+def test_unnamed_index_is_built_without_concurrently():
+    statement, = online_index_statements('CREATE INDEX ON app.t (a)')
+
+    assert statement.sql == statement.original == 'CREATE INDEX ON app.t (a)'
+    assert statement.table == 'app.t'
@@ -0,0 +1,20 @@
+import psycopg2.errors
+
+from tests.conftest import FakeConnection
+
+
+def test_lock_failure_retries_the_transaction_after_rollback(make_installer, write_script, monkeypatch):
+    installer = make_installer(deploy_mode='transactional', lock_timeout='1s', lock_retry_delay=0)
+    first = write_script('OBJ/Schemas/app/Tables/a.sql', 'CREATE TABLE app.a(id int)')
+    second = write_script('OBJ/Schemas/app/Tables/b.sql', 'ALTER TABLE app.b ADD c int')
+    # savepoint, first script, release, savepoint, second script fails on its lock; then the whole batch again
+    connection = FakeConnection([[], [], [], [], psycopg2.errors.LockNotAvailable('lock timeout')])
+    rollbacks = []
+    monkeypatch.setattr(connection, 'rollback', lambda: rollbacks.append(len(connection.queries)))
+    monkeypatch.setattr(installer, 'write_ledger', lambda *args: None)
+    monkeypatch.setattr('postgres_builder.sleep', lambda delay: rollbacks.append('sleep'))
+
+    assert installer.execute_transactional(connection, [first, second]) is None
+    # rolled back before sleeping, then both scripts ran again
+    assert rollbacks[:2] == [5, 'sleep']
+    assert [query for query, _ in connection.queries].count('CREATE TABLE app.a(id int)') == 2